@@ -0,0 +1,181 @@
+"""
+Running aggregates of the submitted responses for the results dashboard.
+
+For every tracked field, aggregate_stats holds n, the sum and the sum of
+squares, and aggregate_hist holds a fixed-width histogram. Together they
+give the mean, the standard deviation, an approximate median (to within
+one bin) and the distribution. The dashboard reads only these two small
+tables and never scans responses.
+
+save_responses_to_db calls update_for_submit() inside its transaction. It
+subtracts the respondent's previous submission, if any, and adds the new
+one, so a resubmission replaces the earlier answers. A respondent's
+"cannot answer" Likert items are left out. rebuild() recomputes everything
+from the submitted rows; the migration that creates the tables uses it, and
+so does `python aggregates.py`.
+"""
+import math
+import os
+
+import db
+import flow_model
+import schema
+import telemetry
+
+# (ryhmä, [(kenttä, histogrammin lokeron leveys)]); lokero k kattaa [(k - 0.5) w, (k + 0.5) w)
+GROUPS = (
+    ("Land cover (%)", [(name, 1) for name in (
+        "protWoodlands", "unprotectedForest", "wildlands", "farmland", "developed", "waterAndWetlands",
+    )]),
+    ("Harvest", [("lumbershare", 1), ("papershare", 1), ("fuelshare", 1), ("logging_intensity", 0.5)]),
+    ("End use 2060 (mcf)", [(name, 1000) for name in flow_model.END_USES]),
+    ("Likert (1-5)", [(name, 1) for name in schema.LIKERT_IDS]),
+)
+
+BIN_WIDTHS = {name: width for _, fields in GROUPS for name, width in fields}
+FIELDS = tuple(BIN_WIDTHS)
+
+UPSERT_STATS_SQL = """
+    INSERT INTO aggregate_stats (field, n, total, total_sq) VALUES (?, ?, ?, ?)
+    ON CONFLICT(field) DO UPDATE SET
+        n = n + excluded.n,
+        total = total + excluded.total,
+        total_sq = total_sq + excluded.total_sq
+"""
+
+UPSERT_HIST_SQL = """
+    INSERT INTO aggregate_hist (field, bin, count) VALUES (?, ?, ?)
+    ON CONFLICT(field, bin) DO UPDATE SET count = count + excluded.count
+"""
+
+SELECT_ROW_SQL = f"SELECT submit_count, {', '.join(FIELDS + tuple(f'{q}_cannot_answer' for q in schema.LIKERT_IDS))} FROM responses WHERE email = ?"
+
+CREATE_TABLES_SQL = (
+    """
+    CREATE TABLE IF NOT EXISTS aggregate_stats (
+        field TEXT PRIMARY KEY,
+        n INTEGER NOT NULL,
+        total REAL NOT NULL,
+        total_sq REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS aggregate_hist (
+        field TEXT NOT NULL,
+        bin INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (field, bin)
+    )
+    """,
+)
+
+
+def field_values(row):
+    """{field: float} of the tracked fields in a responses row (dict); missing values are left out."""
+    values = {}
+    for name in FIELDS:
+        value = row.get(name)
+        if value is None or value == "":
+            continue
+        if name in schema.LIKERT_IDS and row.get(f"{name}_cannot_answer"):
+            continue
+        try:
+            values[name] = float(value)
+        except (TypeError, ValueError):
+            continue
+    return values
+
+
+def _bin(name, value):
+    # Kokonaislukuvastaukset osuvat lokeron keskelle
+    return math.floor(value / BIN_WIDTHS[name] + 0.5)
+
+
+def _apply(conn, values, sign):
+    conn.executemany(UPSERT_STATS_SQL, [(name, sign, sign * v, sign * v * v) for name, v in values.items()])
+    conn.executemany(UPSERT_HIST_SQL, [
+        (name, _bin(name, v), sign) for name, v in values.items()
+    ])
+
+
+def old_submission(conn, email):
+    """The respondent's currently counted answers, or None if they have not submitted."""
+    cursor = conn.execute(SELECT_ROW_SQL, (email,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    row = dict(zip([d[0] for d in cursor.description], row))
+    return row if (row["submit_count"] or 0) > 0 else None
+
+
+def update_for_submit(conn, old_row, new_row):
+    """Replaces `old_row` (from old_submission, or None) by `new_row` in the aggregates."""
+    if old_row is not None:
+        _apply(conn, field_values(old_row), -1)
+    _apply(conn, field_values(new_row), 1)
+
+
+def rebuild(conn):
+    """Recomputes the aggregates from every submitted response. The caller owns the transaction."""
+    # submit_count ajan tasalle tapahtumista ennen kuin sillä rajataan
+    telemetry.materialize_counters(conn)
+    conn.execute("DELETE FROM aggregate_stats")
+    conn.execute("DELETE FROM aggregate_hist")
+    cursor = conn.execute(SELECT_ROW_SQL.replace("WHERE email = ?", "WHERE submit_count > 0"))
+    names = [d[0] for d in cursor.description]
+    for row in cursor:
+        _apply(conn, field_values(dict(zip(names, row))), 1)
+
+
+def _median(hist, n, width):
+    """Median interpolated within its histogram bin."""
+    half = n / 2
+    seen = 0
+    for bin_, count in hist:
+        if count <= 0:
+            continue
+        if seen + count >= half:
+            return (bin_ - 0.5 + (half - seen) / count) * width
+        seen += count
+    return None
+
+
+def summary(conn):
+    """{field: {"n", "mean", "std", "median", "bins", "counts"}} for fields with at least one answer."""
+    hists = {}
+    for field, bin_, count in conn.execute(
+        "SELECT field, bin, count FROM aggregate_hist WHERE count > 0 ORDER BY field, bin"
+    ):
+        hists.setdefault(field, []).append((bin_, count))
+
+    result = {}
+    for field, n, total, total_sq in conn.execute("SELECT field, n, total, total_sq FROM aggregate_stats"):
+        if field not in BIN_WIDTHS or n <= 0:
+            continue
+        width = BIN_WIDTHS[field]
+        mean = total / n
+        hist = hists.get(field, [])
+        result[field] = {
+            "n": n,
+            "mean": mean,
+            "std": math.sqrt(max(total_sq / n - mean * mean, 0.0)),
+            "median": _median(hist, n, width),
+            "bins": [bin_ * width for bin_, _ in hist],
+            "counts": [count for _, count in hist],
+        }
+    return result
+
+
+if __name__ == "__main__":
+    ENV = os.getenv("FLASK_ENV", "development")  # oletus development
+
+    if ENV == "production":
+        DATA_DB_FILE = "/home/hulicupter/flask_app/NEforestry/data.db"
+    else:
+        DATA_DB_FILE = "data.db"
+
+    conn = db.connect(DATA_DB_FILE)
+    with conn:
+        rebuild(conn)
+    conn.close()
+    print("Aggregates rebuilt from the submitted responses.")
@@ -1,4 +1,4 @@
-from dash import Dash, dcc, html, Input, Output, State
+from dash import Dash, dcc, html, Input, Output, State, Patch, ClientsideFunction
 import dash
 import plotly.graph_objects as go
 import sqlite3
@@ -8,9 +8,25 @@ import dash_bootstrap_components as dbc
 import numpy as np
 import json
 import hashlib
-from flask import session, redirect
+from flask import session, redirect, abort, Response
 import datetime
+import copy
+import csv
+import io
 import os
+import threading
+
+import aggregates
+import balance_solver
+from coalesce import coalesce
+import cohorts
+import consensus
+import db
+import feasible_region
+import flow_model
+import migrate
+import schema
+import telemetry
 
 def format_question(question):
     if "bold" in question and question["bold"] in question["text"]:
@@ -28,34 +44,6 @@ def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
 
-def lerp(a, b, t):
-    return int(a + (b - a) * t)
-
-
-def color_from_diff(v, default):
-    if v < 1.1:
-        return "rgba(0,0,0,0)"  # transparent for tiny values
-
-    diff = (v - default) / default
-
-    # scale diff into [0,1] smoothly but not too fast
-    t = min(1.0, abs(diff) ** 0.5)
-
-    # Neutral grey
-    gray = (180, 180, 180)
-
-    if diff > 0:
-        # grey → bright green
-        target = (0, 255, 0)
-    else:
-        # grey → bright red
-        target = (255, 0, 0)
-
-    r = lerp(gray[0], target[0], t)
-    g = lerp(gray[1], target[1], t)
-    b = lerp(gray[2], target[2], t)
-
-    return f"rgb({r},{g},{b})"
 # total forest area (constant)
 
 organization_options = [
@@ -102,43 +90,10 @@ new_england_states = [
 
 TOTAL_FOREST = 31.6
 
-TOTAL_DEMAND = 382452.3
-
-DEFAULTS = {
-    "protWoodlands": 21, #20.94,
-    "unprotectedForest": 57, #58.49,
-    "wildlands": 2, #1.52,
-    "farmland": 5, #5.25,
-    "developed": 10, #9.9,
-    "waterAndWetlands": 5,
-    "woodlands_area": 30.31,
-    "wildlands_area": 1.29,
-    "lumber": 336960,
-    "lumbershare": 40,
-    "paper": 336960,
-    "papershare": 40,
-    "from_lumber_to_pulp": 112207.68,
-    "fuelwood": 168480,
-    "fuelshare": 20,
-    "import_lumber": 150000,
-    "import_paper": 115000,
-    "construction_multistory": 5,
-    "construction_multistory_val": round(TOTAL_DEMAND * 0.05,- 2),
-    "construction_single": 26,
-    "construction_single_val": round(TOTAL_DEMAND * 0.26, -2),
-    "manufacturing": 12,
-    "manufacturing_val": round(TOTAL_DEMAND * 0.12, -2),
-    "packaging": 13,
-    "packaging_val": round(TOTAL_DEMAND * 0.13, -2),
-    "other": 9,
-    "other_val": round(TOTAL_DEMAND * 0.09, -2),
-    "other_construction": 28,   #residential repair and remodeling
-    "other_construction_val": round(TOTAL_DEMAND * 0.28, -2),
-    "non_res_construction": 7,
-    "non_res_construction_val": round(TOTAL_DEMAND * 0.07, -2),
-    "recovery_timber": 8000,
-    "logging_intensity": 27
-}
+# 2020-lähtötilanne (flow_model.DEFAULTS)
+TOTAL_DEMAND = flow_model.TOTAL_DEMAND
+
+DEFAULTS = flow_model.DEFAULTS
 
 DEFAULTS_NUMERIC = [
     DEFAULTS["lumber"],
@@ -162,6 +117,9 @@ DEFAULTS_NUMERIC = [
 
 logging_intensity_values = {1: 10, 2: 17, 3: 27, 4: 35, 5: 45}  # example mapping
 
+# Tasapainotaulukko ladataan kerran käynnistyksessä (feasible_region.py)
+BALANCE_TABLE = feasible_region.load_table()
+
 
 # CSS
 input_style = {
@@ -228,6 +186,42 @@ else:
     USERS_DB_FILE = "users.db"
     DATA_DB_FILE = "data.db"
 
+# Tulossivun (/results) käyttäjät, pilkulla eroteltuina
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
+
+
+def is_admin(email):
+    return bool(email) and email.strip().lower() in ADMIN_EMAILS
+
+
+# Puuttuvat sarakkeet ja indeksit lisätään käynnistyksessä (migrate.py)
+migrate.migrate(DATA_DB_FILE)
+
+# (tietokanta, email) -> dekoodattu responses-rivi. Yksi työprosessi: kaikki kirjoitukset
+# kulkevat tämän prosessin kautta ja tyhjentävät kyseisen sähköpostin rivin.
+_user_data_cache = {}
+_user_data_lock = threading.Lock()
+_USER_DATA_CACHE_SIZE = 2000
+
+
+def invalidate_user_data(emails, db_path=DATA_DB_FILE):
+    """Drops cached fetch_user_data rows after a write to those respondents."""
+    with _user_data_lock:
+        for email in emails:
+            _user_data_cache.pop((db_path, email), None)
+
+
+# Tapahtumat (kirjautumiset, resetit, epäonnistuneet lähetykset) kirjoitetaan erissä events-tauluun
+counters = telemetry.CounterBuffer(DATA_DB_FILE, on_write=invalidate_user_data)
+counters.start()
+
+# Muiden vastaajien maankäyttöjakauma (forest-bar-kaavion vertailukaista)
+cohort_summary = cohorts.CohortSummary(DATA_DB_FILE)
+cohort_summary.start()
+
+# Aktiivisuuden tarkistusväli kyselysivulla
+ACTIVITY_INTERVAL_SECONDS = 30
+
 
 def render_question(question):
     """Render a question with optional bold text."""
@@ -246,15 +240,79 @@ def render_question(question):
 
 
 def check_user(email, password):
-    conn = sqlite3.connect(USERS_DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT password_hash FROM users WHERE email=?", (email,))
-    row = c.fetchone()
-    conn.close()
+    conn = db.get_connection(USERS_DB_FILE)
+    row = conn.execute("SELECT password_hash FROM users WHERE email=?", (email,)).fetchone()
     if row and hash_password(password) == row[0]:
         return True
     return False
 
+def sankey_link_values(values):
+    """Link values of the Sankey in the order of make_sankey's sources/targets."""
+    return [
+        values.get("lumber", 0),  # Intensity → Lumber
+        values.get("paper",0),  # Intensity → Paper
+        values.get("fuelwood",0),  # Intensity → Fuelwood
+        values.get("import_lumber", 0),
+        values.get("import_paper", 0),
+        values.get("construction_multistory_val", 0),
+        values.get("construction_single_val", 0),
+        values.get("manufacturing_val", 0),
+        values.get("packaging_val", 0),
+        values.get("other_val", 0),
+        values.get("other_construction_val", 0),
+        values.get("non_res_construction_val", 0),
+    #    1,
+        1,
+        1,
+        values.get("recovery_timber", 0),
+        values.get("from_lumber_to_pulp", 0)
+    ]
+
+
+_DEFAULTS_NUMERIC_ARRAY = np.asarray(DEFAULTS_NUMERIC, dtype=np.float64)
+
+# Muotoillut värimerkkijonot pakatun rgb-avaimen mukaan (-1 = läpinäkyvä)
+_link_color_strings = {-1: "rgba(0,0,0,0)"}
+
+
+def _link_color_string(key):
+    text = _link_color_strings.get(key)
+    if text is None:
+        text = f"rgb({key >> 16},{(key >> 8) & 255},{key & 255})"
+        _link_color_strings[key] = text
+    return text
+
+
+def link_colors(values, defaults=_DEFAULTS_NUMERIC_ARRAY):
+    """
+    Colours Sankey links by their change from the 2020 defaults:
+    grey = unchanged, towards green = increase, towards red = decrease.
+    `values` is one link list or an (N x links) array of scenarios; the result
+    has the same shape as a list (of lists) of rgb strings.
+    """
+    v = np.asarray(values, dtype=np.float64)
+
+    # puuttuvat arvot (NaN) päätyvät läpinäkyviksi alla
+    with np.errstate(divide="ignore", invalid="ignore"):
+        diff = (v - defaults) / defaults
+
+        # scale diff into [0,1] smoothly but not too fast
+        t = np.minimum(1.0, np.sqrt(np.abs(diff)))
+
+        # grey (180) → bright green (0,255,0) or bright red (255,0,0)
+        increase = diff > 0
+        r = (180 + (np.where(increase, 0, 255) - 180) * t).astype(np.int64)
+        g = (180 + (np.where(increase, 255, 0) - 180) * t).astype(np.int64)
+        b = (180 + (0 - 180) * t).astype(np.int64)
+
+    transparent = ~(v >= 1.1)  # transparent for tiny (and missing) values
+    keys = np.where(transparent, -1, (r << 16) | (g << 8) | b)
+
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    strings = np.array([_link_color_string(int(k)) for k in unique_keys], dtype=object)
+    return strings[inverse].reshape(keys.shape).tolist()
+
+
 def make_sankey(values):
     labels = [
         "Woodlands (million acres)",  # 0
@@ -280,8 +338,6 @@ def make_sankey(values):
         ]
 
 
-    woodlands = values.get("woodlands") or 0
-
     sources = [
         1, 1, 1, 6, 7, 3, 3, 3, 3, 3, 3, 3, 4, 5, 3, 3
     ]
@@ -289,27 +345,7 @@ def make_sankey(values):
         3, 4, 5, 3, 4, 9, 10, 11, 12, 13, 14, 15, 17, 18, 3, 4
     ]
 
-    woodlands_volume = values.get("intensity_volume", 0)
-
-    values_list = [
-        values.get("lumber", 0),  # Intensity → Lumber
-        values.get("paper",0),  # Intensity → Paper
-        values.get("fuelwood",0),  # Intensity → Fuelwood
-        values.get("import_lumber", 0),
-        values.get("import_paper", 0),
-        values.get("construction_multistory_val", 0),
-        values.get("construction_single_val", 0),
-        values.get("manufacturing_val", 0),
-        values.get("packaging_val", 0),
-        values.get("other_val", 0),
-        values.get("other_construction_val", 0),
-        values.get("non_res_construction_val", 0),
-    #    1,
-        1,
-        1,
-        values.get("recovery_timber", 0),
-        values.get("from_lumber_to_pulp", 0)
-    ]
+    values_list = sankey_link_values(values)
 
 
 #6D4C41 < tumma
@@ -350,13 +386,13 @@ def make_sankey(values):
         "#4CAF50",  # 19: Lumber (loop)
     ]
 
-    link_colors = [color_from_diff(v, default) for v, default in zip(values_list, DEFAULTS_NUMERIC)]
+    link_colors_list = link_colors(values_list)
 
-    special_flow_index = len(link_colors) - 1  # viimeinen linkki, lumber loop
+    special_flow_index = len(link_colors_list) - 1  # viimeinen linkki, lumber loop
     # customdata for every link
 
     labels_for_links = []
-    for i in range(len(link_colors)):
+    for i in range(len(link_colors_list)):
         if i == special_flow_index:
             labels_for_links.append(
                 "This flow is constant and follows lumber harvesting volumes linearly."
@@ -370,7 +406,7 @@ def make_sankey(values):
             label=labels,
             color=node_colors,
         ),
-        link=dict(source=sources, target=targets, value=values_list, color=link_colors, label=labels_for_links)
+        link=dict(source=sources, target=targets, value=values_list, color=link_colors_list, label=labels_for_links)
     )])
 
     fig.add_annotation(
@@ -407,9 +443,57 @@ def make_sankey(values):
     return fig
 
 
-# --- Funktio, joka luo stacked line chartin ---
-def make_stacked_bar(values):
+LANDCOVER_CATEGORIES = ["wildlands", "protWoodlands", "unprotectedForest", "farmland", "developed", "waterAndWetlands"]
+
+# Historiadata jaetaan kaikkien pyyntöjen kesken: (mtime, {sarake: np.ndarray})
+_landcover_history = {"mtime": None, "columns": None}
+_landcover_lock = threading.Lock()
+
+
+def load_landcover_history(path=None):
+    """
+    Returns the land-cover history as read-only NumPy columns
+    ({"year": int array, category: float array, ...}).
+    The CSV is parsed once per process and re-read only when its mtime changes.
+    """
+    path = path or landcover_data
+    mtime = os.stat(path).st_mtime
+
+    cached = _landcover_history
+    if cached["mtime"] == mtime and cached["columns"] is not None:
+        return cached["columns"]
+
+    with _landcover_lock:
+        # toinen säie ehti jo ladata saman version
+        if _landcover_history["mtime"] == mtime and _landcover_history["columns"] is not None:
+            return _landcover_history["columns"]
+
+        df = pd.read_csv(path, sep=None, engine="python")
+
+        columns = {"year": df["year"].to_numpy(dtype=np.int64)}
+        for cat in LANDCOVER_CATEGORIES:
+            if cat in df.columns:
+                columns[cat] = df[cat].to_numpy(dtype=np.float64)
+            else:
+                columns[cat] = np.zeros(len(df), dtype=np.float64)
+
+        for arr in columns.values():
+            arr.flags.writeable = False
+
+        _landcover_history["columns"] = columns
+        _landcover_history["mtime"] = mtime
+        return columns
+
+
+# Valmiiksi rakennettu pohjakuva: (historia-olio, figure-dict). Dictiä ei koskaan muokata.
+_landcover_template = {"history": None, "figure": None}
 
+
+def _build_landcover_template(history):
+    """
+    Builds the land cover chart once: history traces, styling, the 2020 line
+    and the footnote. The 2060 point of each trace is left as a placeholder.
+    """
     name_map = {
         "waterAndWetlands": "Water and Wetlands",
         "developed": "Development",
@@ -418,35 +502,18 @@ def make_stacked_bar(values):
         "protWoodlands": "Protected Forest",
         "wildlands": "Wildlands"
     }
-    """
-    values = {
-        "wildlands": float,
-        "protwoodlands": float,
-        "unprotectedForests": float,
-        "farmland": float,
-        "developed": float,
-        "water_wetlands": float  # optional dummy
-    }
-    """
-    # Ladataan historiadata
-    df = pd.read_csv(landcover_data, sep=None, engine="python")
 
-    categories = ["wildlands", "protWoodlands", "unprotectedForest", "farmland", "developed", "waterAndWetlands"]
+    categories = LANDCOVER_CATEGORIES
     colors = ["#33691E", "#2E7D32", "#4CAF50", "#FBC02D", "#D32F2F", "#9E9E9E"]
     marker_symbols = ["circle", "square", "diamond", "triangle-up", "cross", "x"]
 
-    years = df["year"].tolist() + [2060]  # history + projection year
+    years = history["year"].tolist() + [2060]  # history + projection year
 
     fig = go.Figure()
 
     for i, cat in enumerate(categories):
-        # Historiallinen data
-        hist_vals = df[cat].tolist() if cat in df.columns else [0] * len(df)
-        # Projektiopiste 2050
-        proj_val = values.get(cat, 0)
-
-        # Yhdistetään historia ja projektiopiste
-        y_values = hist_vals + [proj_val]
+        # Historiallinen data + paikka projektiopisteelle
+        y_values = history[cat].tolist() + [0]
 
         fig.add_trace(go.Scatter(
             name=name_map.get(cat, cat),
@@ -458,6 +525,20 @@ def make_stacked_bar(values):
             stackgroup="one"
         ))
 
+    # Muiden vastaajien 10.–90. persentiili vuodelle 2060 pinon rajoille
+    # (piilossa, näytetään update_cohort_overlay-callbackissa)
+    boundaries = len(categories) - 1  # ylin raja on aina 100 %
+    fig.add_trace(go.Scatter(
+        name="Other respondents (10th–90th percentile)",
+        x=[2060] * boundaries,
+        y=[0] * boundaries,
+        mode="markers",
+        marker=dict(symbol="line-ew", size=14, color="black", line=dict(width=2)),
+        error_y=dict(type="data", symmetric=False, array=[0] * boundaries, arrayminus=[0] * boundaries,
+                     color="black", thickness=1.5, width=8),
+        visible=False,
+    ))
+
     fig.update_layout(
         title="Land Cover Distribution (% of total area)",
       #  xaxis_title="Year",
@@ -487,7 +568,53 @@ def make_stacked_bar(values):
         xanchor="left", yanchor="top"
     )
 
-    return fig
+    return fig.to_dict()
+
+
+def get_landcover_template():
+    """Returns the shared base figure, rebuilding it only when the history file changes."""
+    history = load_landcover_history()
+    if _landcover_template["history"] is not history:
+        with _landcover_lock:
+            if _landcover_template["history"] is not history:
+                _landcover_template["figure"] = _build_landcover_template(history)
+                _landcover_template["history"] = history
+    return _landcover_template["figure"]
+
+
+# --- Funktio, joka luo stacked line chartin ---
+def make_stacked_bar(values):
+    """
+    values = {
+        "wildlands": float,
+        "protWoodlands": float,
+        "unprotectedForest": float,
+        "farmland": float,
+        "developed": float,
+        "waterAndWetlands": float
+    }
+    Stamps the six 2060 projection values onto a shallow copy of the base figure.
+    """
+    base = get_landcover_template()
+
+    data = []
+    for trace, cat in zip(base["data"], LANDCOVER_CATEGORIES):
+        # Projektiopiste 2060
+        y_values = list(trace["y"][:-1]) + [values.get(cat, 0)]
+        data.append({**trace, "y": y_values})
+    # vertailukaista sellaisenaan
+    data += base["data"][len(LANDCOVER_CATEGORIES):]
+
+    return {"data": data, "layout": base["layout"]}
+
+
+def patch_stacked_bar(values):
+    """Partial update for an already rendered land cover chart: only the 2060 points change."""
+    base = get_landcover_template()
+    patched = Patch()
+    for i, (trace, cat) in enumerate(zip(base["data"], LANDCOVER_CATEGORIES)):
+        patched["data"][i]["y"][len(trace["y"]) - 1] = values.get(cat, 0)
+    return patched
 
 
 login_layout = dbc.Container(
@@ -510,52 +637,172 @@ login_layout = dbc.Container(
     className="mt-5"
 )
 
-thankyou_layout = dbc.Container(
-    dbc.Row(
-        dbc.Col(
-            dbc.Card(
-                dbc.CardBody([
-                    html.H3(
-                        "Thank you for participating in the survey!",
-                        className="text-center mb-4"
-                    ),
+# Konsensus-Sankey välimuistissa, kunnes joku lähettää vastauksensa
+_consensus_cache = {"signature": None, "figure": None}
+_consensus_lock = threading.Lock()
 
-                    html.P(
-                        "Your responses have been successfully submitted.",
-                        className="text-center"
-                    ),
 
-                    html.P(
-                        "You may return and update your answers at any time using your email "
-                        "address and the provided password until March 1st, 2026. Only your most recent submission "
-                        "will be considered.",
-                        className="text-center"
-                    ),
+def consensus_sankey():
+    """Median Sankey of all submitted scenarios (IQR in the link hover), or None before consensus.MIN_RESPONDENTS."""
+    conn = db.get_connection(DATA_DB_FILE)
+    signature = consensus.submissions_signature(conn)
+    with _consensus_lock:
+        if _consensus_cache["signature"] == signature and signature is not None:
+            return _consensus_cache["figure"]
 
-                    html.Hr(className="my-4"),
+    summary = consensus.flow_quantiles(consensus.load_scenarios(conn))
+    if summary is None:
+        return None
+
+    fig = make_sankey(summary["median"])
+    # IQR lisätään olemassa olevien linkkitekstien perään (esim. lumber-silmukan selite)
+    labels = list(fig.data[0].link.label)
+    for i, (lo, hi) in enumerate(zip(sankey_link_values(summary["q1"]), sankey_link_values(summary["q3"]))):
+        if i not in (12, 13):
+            iqr = f"Middle 50% of respondents: {lo:,.0f} – {hi:,.0f}"
+            labels[i] = f"{labels[i]}<br>{iqr}" if labels[i] else iqr
+    fig.update_traces(link=dict(label=labels))
+    fig.update_layout(title_text=f"Median 2060 vision of {summary['n']} respondents")
+
+    with _consensus_lock:
+        _consensus_cache["signature"] = signature
+        _consensus_cache["figure"] = fig
+    return fig
+
+
+def thankyou_layout():
+    figure = consensus_sankey()
+    if figure is not None:
+        consensus_body = [
+            html.P("Each flow shows the median of all submitted responses; "
+                   "hover over a flow to see the range of the middle 50% of respondents."),
+            dcc.Graph(figure=figure, config={"displayModeBar": False}),
+        ]
+    else:
+        consensus_body = [html.P("Not enough responses yet to summarise. Please check back later.")]
+    consensus_row = [dbc.Row(dbc.Col(
+        [html.H4("How other respondents see 2060", className="mt-5")] + consensus_body,
+        width=12,
+    ))]
+
+    return dbc.Container([
+        dbc.Row(
+            dbc.Col(
+                dbc.Card(
+                    dbc.CardBody([
+                        html.H3(
+                            "Thank you for participating in the survey!",
+                            className="text-center mb-4"
+                        ),
+
+                        html.P(
+                            "Your responses have been successfully submitted.",
+                            className="text-center"
+                        ),
+
+                        html.P(
+                            "You may return and update your answers at any time using your email "
+                            "address and the provided password until March 1st, 2026. Only your most recent submission "
+                            "will be considered.",
+                            className="text-center"
+                        ),
+
+                        html.Hr(className="my-4"),
+
+                        dbc.Button(
+                            "Return to Login",
+                            id="thankyou-login-btn",
+                            href="/login",
+                            color="primary",
+                            className="w-100"
+                        )
+                    ]),
+                    className="shadow p-4"
+                ),
+                width=8,
+                className="offset-md-2"
+            )
+        )] + consensus_row,
+        className="mt-5"
+    )
+
+
+def results_label(name):
+    for q in likert_questions:
+        if q["id"] == name:
+            return q.get("bold", name).capitalize()
+    return name.replace("_val", "").replace("_", " ")
+
+
+def results_histogram(stats, name):
+    """Distribution of one field from aggregates.summary(), with the mean and median marked."""
+    fig = go.Figure()
+    s = stats.get(name)
+    if s:
+        fig.add_trace(go.Bar(
+            x=s["bins"], y=s["counts"],
+            width=aggregates.BIN_WIDTHS[name],
+            marker_color="#4CAF50",
+        ))
+        fig.add_vline(x=s["mean"], line_dash="dash", annotation_text="mean")
+        if s["median"] is not None:
+            fig.add_vline(x=s["median"], line_dash="dot", annotation_text="median")
+    fig.update_layout(
+        title=f"{results_label(name)} (n = {s['n'] if s else 0})",
+        yaxis_title="Respondents",
+        bargap=0.05,
+        margin=dict(t=60, b=40),
+    )
+    return fig
+
+
+def results_layout():
+    """Admin-only overview of the submitted responses, read from the aggregate tables."""
+    stats = aggregates.summary(db.get_connection(DATA_DB_FILE))
+
+    def fmt(value):
+        return "" if value is None else f"{value:,.1f}"
+
+    rows = []
+    for group, fields in aggregates.GROUPS:
+        rows.append(html.Tr(html.Th(group, colSpan=5, className="table-light")))
+        for name, _ in fields:
+            s = stats.get(name, {})
+            rows.append(html.Tr([
+                html.Td(results_label(name)),
+                html.Td(s.get("n", 0)),
+                html.Td(fmt(s.get("mean"))),
+                html.Td(fmt(s.get("median"))),
+                html.Td(fmt(s.get("std"))),
+            ]))
+
+    field_options = [
+        {"label": f"{group}: {results_label(name)}", "value": name}
+        for group, fields in aggregates.GROUPS for name, _ in fields
+    ]
+    first = field_options[0]["value"]
+
+    return dbc.Container([
+        html.H3("Survey results", className="mt-4"),
+        html.P("Submitted responses only; a resubmission replaces the respondent's earlier answers. "
+               "Medians are interpolated within histogram bins."),
+        dbc.Table([
+            html.Thead(html.Tr([html.Th(h) for h in ["Field", "n", "Mean", "Median", "Std"]])),
+            html.Tbody(rows),
+        ], bordered=True, size="sm"),
+        dcc.Dropdown(id="results-field", options=field_options, value=first, clearable=False),
+        dcc.Graph(id="results-histogram", figure=results_histogram(stats, first)),
+    ])
 
-                    dbc.Button(
-                        "Return to Login",
-                        id="thankyou-login-btn",
-                        href="/login",
-                        color="primary",
-                        className="w-100"
-                    )
-                ]),
-                className="shadow p-4"
-            ),
-            width=8,
-            className="offset-md-2"
-        )
-    ),
-    className="mt-5"
-)
 
 def survey_layout(defaults, db_data, sankey_fig=None, bar_fig=None):
     if db_data is None:
         db_data = {}
     return html.Div([
   #  dcc.Store(id="login-state", data=False),
+        # Aktiivisuusajastin vain kyselysivulla
+        dcc.Store(id="last-active-ts", data=datetime.datetime.now().timestamp()),
+        dcc.Interval(id="activity-interval", interval=ACTIVITY_INTERVAL_SECONDS * 1000, n_intervals=0),
 
         html.Div([
             html.H3("Survey: VISION 2060 for New England Forests", style={"fontWeight": "bold", "marginBottom": "10px"}),
@@ -801,7 +1048,18 @@ def survey_layout(defaults, db_data, sankey_fig=None, bar_fig=None):
         html.Div([
             dcc.Graph(id="forest-bar",
                 figure=bar_fig if bar_fig else make_stacked_bar(form_defaults),
-                      config={"displayModeBar": False, "staticPlot": True})
+                      config={"displayModeBar": False, "staticPlot": True}),
+            dbc.RadioItems(
+                id="cohort-overlay",
+                options=[
+                    {"label": "Hide other respondents", "value": "off"},
+                    {"label": "Compare with all respondents", "value": "all"},
+                    {"label": "Compare with my organization type", "value": "org"},
+                ],
+                value="off",
+                inline=True,
+            ),
+            html.Div(id="cohort-overlay-note", style={"fontSize": "14px", "color": "gray"}),
         ], style={
             "width": "100%",
             "padding": "20px",
@@ -980,7 +1238,6 @@ def survey_layout(defaults, db_data, sankey_fig=None, bar_fig=None):
         })
     ], style={"width": "100%"}),
     # Alempi osa: Sankey ja syöttökentät
-    dcc.Store(id="model-data"),
     dcc.Store(id="wildlands_area"),
     dcc.Store(id="woodlands_area"),
 
@@ -1137,7 +1394,15 @@ html.Div([
 
             dcc.Graph(id="sankey",
                 figure=sankey_fig if sankey_fig else make_sankey(form_defaults),
-                      config={"displayModeBar": False})
+                      config={"displayModeBar": False}),
+            # 2020-arvot ja mallin vakiot selaimen laskentaa varten (assets/sankey.js, assets/balance.js)
+            dcc.Store(id="sankey-defaults", data={
+                "defaults": DEFAULTS_NUMERIC,
+                "harvest_area_factor": flow_model.HARVEST_AREA_FACTOR,
+                "lumber_to_pulp": flow_model.LUMBER_TO_PULP,
+                "balance_tolerance": flow_model.BALANCE_TOLERANCE,
+                "sd_box_style": SD_BOX_STYLE,
+            })
         ], style={
             "position": "relative",
             "marginTop": "40px",
@@ -1169,7 +1434,8 @@ html.Div([
                     id="logging_intensity", min=10, max=45, step=0.5,
                     value=defaults.get("logging_intensity", 27),
                     tooltip={"placement": "bottom", "always_visible": True},
-                    marks={i: str(i) for i in range(10, 46, 10)}
+                    marks={i: str(i) for i in range(10, 46, 10)},
+                    updatemode="mouseup"  # yksi callback per siirto, ei jokaisesta välipisteestä
                 ),
 
                 html.Div(id="total_logging", style={"marginTop": "5px", "fontWeight": "bold", "marginBottom": "10px"}),
@@ -1785,6 +2051,8 @@ html.Div([
 
                 html.Div(id="lumber_supply_text2", style={"marginTop": "20px", "marginBottom": "10px"}),
                 html.Div(id="lumber_demand_status", style={"marginTop": "20px", "marginBottom": "10px"}),
+                html.Div(id="balance-hint", style={"marginTop": "10px", "marginBottom": "10px", "fontSize": "14px"}),
+                dcc.Store(id="balance-hint-request"),
           #      html.Div(id="lumber_demand_status",
            #              style={"color": "green", "fontSize": "18px", "marginBottom": "10px"}),
              #   html.Div(id="lumber_supply_status_text"),
@@ -1802,6 +2070,21 @@ html.Div([
                     id="sd_style_box"),
 
             html.Div([
+                html.Button("Auto-balance lumber supply", id="auto-balance-btn", n_clicks=0,
+                            title="Sets lumber import (and harvesting intensity if needed) so that supply matches demand",
+                            style={
+                                "marginTop": "20px",
+                                "padding": "12px 26px",
+                                "fontWeight": "bold",
+                                "fontSize": "16px",
+                                "color": "white",
+                                "background": "linear-gradient(135deg, #28A745 0%, #1E7E34 100%)",
+                                "border": "none",
+                                "borderRadius": "8px",
+                                "cursor": "pointer",
+                                "boxShadow": "0 4px 8px rgba(0,0,0,0.15)",
+                                "transition": "all 0.2s ease-in-out",
+                            }),
                 html.Button("Set section 3 variables to default", id="reset-btn-2", n_clicks=0,
                             style={
                                 "marginTop": "20px",
@@ -2033,8 +2316,6 @@ html.Div([
 
 app.layout = html.Div([
     dcc.Location(id="url", refresh=True),
-    dcc.Store(id="last-active-ts", data=datetime.datetime.now().timestamp()),
-    dcc.Interval(id="activity-interval", interval=30 * 1000, n_intervals=0),
     dcc.Store(id="login-state", data={}, storage_type="session"),
     dcc.Store(id="user-email", data="", storage_type="session"),
     html.Div(id="page-content"),  # will be either login_layout or survey_layout
@@ -2074,119 +2355,14 @@ def login_callback(n_clicks, email, password):
 
 def ensure_user_defaults(email):
     """
-    Lisää käyttäjän rivin kantaan, jos sitä ei ole, ja täyttää DEFAULTS-arvot + nollakentät.
+    Lisää käyttäjän rivin kantaan, jos sitä ei ole, ja täyttää DEFAULTS-arvot + nollakentät
+    (oletusarvot schema.COLUMNS:ssa).
     """
-    likert_columns = [
-        "regional_economy",
-        "local_owners",
-        "carbon_substitution",
-        "carbon_storage",
-        "biodiversity",
-        "local_sourcing",
-        "employment_conditions",
-        "training_development",
-        "community_engagement"
-    ]
-
-    text_boxes = [
-        "state_other",
-        "organization_size",
-        "organization_type_other",
-        "prof_position_other",
-        "general_comment",
-    ]
-
-    conn = sqlite3.connect(DATA_DB_FILE)
-    c = conn.cursor()
-
-    # Tarkistetaan onko käyttäjä jo olemassa
-    c.execute("SELECT 1 FROM responses WHERE email = ?", (email,))
-    exists = c.fetchone()
-
-    if not exists:
-        # Kaikki kantataulun sarakkeet paitsi id ja timestamp
-        columns = [
-            "email",
-            "state_checklist",
-            "state_other",
-            "organization_size",
-            "organization_type",
-            "organization_type_other",
-            "general_comment",
-            "prof_position",
-            "prof_position_other",
-            "years_experience",
-            "protWoodlands",
-            "unprotectedForest",
-            "wildlands",
-            "farmland",
-            "developed",
-            "waterAndWetlands",
-            "lumbershare",
-            "papershare",
-            "from_lumber_to_pulp",
-            "fuelshare",
-            "import_lumber",
-            "import_paper",
-            "construction_multistory_val",
-            "construction_single_val",
-            "manufacturing_val",
-            "packaging_val",
-            "other_val",
-            "other_construction_val",
-            "non_res_construction_val",
-            "recovery_timber",
-            "logging_intensity",
-            "regional_economy",
-            "local_owners",
-            "carbon_substitution",
-            "carbon_storage",
-            "biodiversity",
-            "local_sourcing",
-            "employment_conditions",
-            "training_development",
-            "community_engagement",
-            "regional_economy_cannot_answer",
-            "local_owners_cannot_answer",
-            "carbon_substitution_cannot_answer",
-            "carbon_storage_cannot_answer",
-            "biodiversity_cannot_answer",
-            "local_sourcing_cannot_answer",
-            "employment_conditions_cannot_answer",
-            "training_development_cannot_answer",
-            "community_engagement_cannot_answer",
-            "reset_btn_1",
-            "reset_btn_2",
-            "submit_count",
-            "logout_without_responding",
-            "elapsed_time_seconds",
-            "logins"
-        ]
-
-        # Rakennetaan arvot: käytetään DEFAULTS jos olemassa, muuten 0
-        values = []
-        for col in columns:
-            if col == "email":
-                values.append(email)
-            elif col in likert_columns:
-                values.append(3)  # Likert default
-            elif col.endswith("_cannot_answer"):
-                values.append(0)  # cannot answer default
-            elif col in text_boxes:
-                values.append("")
-            elif col == "years_experience":
-                values.append(None)
-            else:
-                values.append(DEFAULTS.get(col, 0))  # muut DEFAULTS-arvot tai 0
+    conn = db.get_connection(DATA_DB_FILE)
+    with conn:
+        conn.execute(schema.INSERT_DEFAULT_ROW_SQL, schema.default_row(email))
 
-        placeholders = ", ".join(["?"] * len(columns))
-        c.execute(f"""
-            INSERT INTO responses ({', '.join(columns)})
-            VALUES ({placeholders})
-        """, values)
-        conn.commit()
 
-    conn.close()
 # Page switching
 # --- Display correct page based on URL ---
 @app.callback(
@@ -2205,7 +2381,7 @@ def display_page(pathname, email, logged_in):
             data_with_calcs = calculate_derived_values(db_data)
 
             # 2️⃣ Form defaults (Likertit, muut inputit)
-            form_defaults = populate_form_from_db(data_with_calcs, likert_questions)
+            form_defaults = populate_form_from_db(data_with_calcs)
             print(form_defaults)
             # 3️⃣ Chartit heti laskettujen arvojen perusteella
             sankey_fig = make_sankey(data_with_calcs)
@@ -2215,22 +2391,36 @@ def display_page(pathname, email, logged_in):
         else:
             return login_layout
     elif pathname == "/thankyou":
-        return thankyou_layout
+        return thankyou_layout()
+    elif pathname == "/results":
+        # Tarkistus palvelimen istunnosta, ei selaimen login-state -storesta
+        if session.get("logged_in") and is_admin(session.get("email")):
+            return results_layout()
+        return login_layout
     else:
         return login_layout
 
 
+@app.callback(
+    Output("results-histogram", "figure"),
+    Input("results-field", "value"),
+    prevent_initial_call=True
+)
+def update_results_histogram(name):
+    if not (session.get("logged_in") and is_admin(session.get("email"))):
+        raise dash.exceptions.PreventUpdate
+    return results_histogram(aggregates.summary(db.get_connection(DATA_DB_FILE)), name)
+
+
 def calculate_derived_values(data):
     """
     Laskee kaikki derived values user-datasta.
     Palauttaa uuden dictin, jossa myös laskelmat mukana.
     """
     data = data.copy()  # välttää muuttamasta alkuperäistä
-    data["total_logging"] = data.get("logging_intensity",0) * ((data.get("protWoodlands",0) + data.get("unprotectedForest",0))/100 * 40000)
-    data["lumber"] = data["total_logging"] * (data.get("lumbershare",0)/100)
-    data["from_lumber_to_pulp"] = 0.333 * data["lumber"]
-    data["paper"] = data["total_logging"] * (data.get("papershare",0)/100)
-    data["fuelwood"] = data["total_logging"] * (data.get("fuelshare",0)/100)
+    flows = flow_model.compute_flows_for(data)
+    for key in ("total_logging", "lumber", "from_lumber_to_pulp", "paper", "fuelwood"):
+        data[key] = flows[key]
     # muut laskelmat tarvittaessa
     return data
 
@@ -2243,17 +2433,8 @@ def calculate_derived_values(data):
 )
 def logout(n_clicks, email):
     if n_clicks:
-        conn = sqlite3.connect(DATA_DB_FILE)
-        c = conn.cursor()
-
-        c.execute("""
-            UPDATE responses
-            SET logout_without_responding = COALESCE(logout_without_responding, 0) + 1
-            WHERE email = ?
-        """, (email,))
-
-        conn.commit()
-        conn.close()
+        counters.add(email, "logout_without_responding")
+        counters.materialize(email)
 
         session.clear()
         return False, "/"
@@ -2303,32 +2484,13 @@ def reset_defaults(n_clicks):
 
 
 def increment_reset_counter(email, column):
-    conn = sqlite3.connect(DATA_DB_FILE)
-    c = conn.cursor()
     print("+ increment")
     print(column)
-    c.execute(f"""
-        UPDATE responses
-        SET {column} = COALESCE({column}, 0) + 1
-        WHERE email = ?
-    """, (email,))
-
-    conn.commit()
-    conn.close()
+    counters.add(email, column)
 
 
 def increment_login_count(user_email):
-    conn = sqlite3.connect(DATA_DB_FILE)
-    c = conn.cursor()
-
-    c.execute("""
-        UPDATE responses
-        SET logins = COALESCE(logins, 0) + 1
-        WHERE email = ?
-    """, (user_email,))
-
-    conn.commit()
-    conn.close()
+    counters.add(user_email, "logins")
 
 @app.callback(
     [
@@ -2440,468 +2602,180 @@ def update_wildlands(woodlands):
 
 '''
 
-INPUT_ORDER = [
-    "logging_intensity",
-    "protWoodlands",
-    "unprotectedForest",
-    "wildlands",
-    "farmland",
-    "developed",
-    "lumbershare",
-    "papershare",
-    "fuelshare",
-    "import_lumber",
-    "import_paper",
-  #  "construction_multistory",
-  #  "construction_single",
-  #  "manufacturing",
-  #  "packaging",
-  #  "other",
-  #  "other_construction",
-  #  "non_res_construction",
-    "recovery_timber",
-    "woodlands_area",
-    "wildlands_area",
-    "lumber",
-    "paper",
-    "fuelwood",
-    "from_lumber_to_pulp",
-    "construction_multistory_val",
-    "construction_single_val",
-    "manufacturing_val",
-    "packaging_val",
-    "other_val",
-    "non_res_construction_val",
-    "other_construction_val",
-
-]
-
-@app.callback(
-    [
-        Output("model-data", "data"),
-        Output("sankey", "figure"),
-        Output("capacity-status", "children"),
-        Output("capacity-status", "style"),
-        Output("share_style_box", "style"),
-        Output("sd_style_box", "style"),
-        Output("lumber_demand_status", "children"),
-        Output("lumber_supply_status", "children"),
-        Output("lumber_supply_status", "style"),
-        Output("lumber_supply_text", "children"),
-        Output("lumber_supply_text2", "children"),
-        Output("pulp_supply_text", "children"),
-        Output("fuel_supply_text", "children"),
-        Output("total_logging", "children"),
-        Output("timber_supply", "children"),
-        Output("construction_multistory_val", "max"),
-        Output("construction_single_val", "max"),
-        Output("manufacturing_val", "max"),
-        Output("packaging_val", "max"),
-        Output("other_val", "max"),
-        Output("other_construction_val", "max"),
-        Output("non_res_construction_val", "max"),
-        Output("construction_multistory_change", "children"),
-        Output("construction_single_change", "children"),
-        Output("manufacturing_change", "children"),
-        Output("packaging_change", "children"),
-        Output("other_change", "children"),
-        Output("non_res_construction_change", "children"),
-        Output("other_construction_change", "children")
-
-        #     Output("construction_multistory", "children")
-    ],
-    [
-        Input("logging_intensity", "value"),
-        Input("protWoodlands", "value"),
-        Input("unprotectedForest", "value"),
-        Input("wildlands", "value"),
-        Input("farmland", "value"),
-        Input("developed", "value"),
-        Input("lumbershare", "value"),
-        Input("papershare", "value"),
-        Input("fuelshare", "value"),
-        Input("import_lumber", "value"),
-        Input("import_paper", "value"),
-        Input("recovery_timber", "value"),
-    #    Input("construction_multistory", "value"),
-   #     Input("construction_single", "value"),
-   #     Input("manufacturing", "value"),
-   #     Input("packaging", "value"),
-   #     Input("other", "value"),
-   #     Input("other_construction", "value"),
-   #     Input("non_res_construction", "value"),
-        State("woodlands_area", "data"),
-        State("wildlands_area","data"),
-        State("lumber", "data"),
-        State("paper", "data"),
-        State("fuelwood", "data"),
-        State("from_lumber_to_pulp", "data"),
-        Input("construction_multistory_val", "value"),
-        Input("construction_single_val", "value"),
-        Input("manufacturing_val", "value"),
-        Input("packaging_val", "value"),
-        Input("other_val", "value"),
-        Input("non_res_construction_val", "value"),
-        Input("other_construction_val", "value"),
-        Input("reset-btn-1", "n_clicks"),
-        Input("reset-btn-2", "n_clicks")
-    ],
-)
-def update_all_charts(*vals):
-    ctx = dash.callback_context
-
-    # Detect if reset was pressed
-    triggered_id = ctx.triggered[0]["prop_id"].split(".")[0]
-
-
-    vals_int = [float(v) if v is not None else 0 for v in vals]
-
-    data = dict(zip(INPUT_ORDER, vals_int))
-
-    keys_btn1 = ["protWoodlands", "unprotectedForest", "developed", "farmland", "wildlands"]
-    keys_btn2 = [
-        "logging_intensity",
-        "lumbershare",
-        "papershare",
-        "fuelshare",
-        "import_lumber",
-        "import_paper",
-        "recovery_timber",
-        "construction_multistory_val",
-        "construction_single_val",
-        "manufacturing_val",
-        "packaging_val",
-        "other_val",
-        "other_construction_val",
-        "non_res_construction_val"
-    ]
-
-    total_shares = data["lumbershare"] + data["papershare"] + data["fuelshare"]
-
-    total_enduse = round(
-        data["construction_multistory_val"] +
-        data["construction_single_val"] +
-        data["manufacturing_val"] +
-        data["packaging_val"] +
-        data["other_val"] +
-        data["other_construction_val"] +
-        data["non_res_construction_val"]
-    , -2)
-
-    total_logging = data["logging_intensity"] * (((data["unprotectedForest"] + data["protWoodlands"]))/100 * 40000)
-
-    from_lumber_to_pulp = 0.333 * data["lumber"]
-
-    lumber_supply = round((data["lumbershare"] / 100 * total_logging) + data["import_lumber"] - data["from_lumber_to_pulp"] + data["recovery_timber"], -2)
+# Sisään tulevat tarjontapuolen kentät; kukin callback kuuntelee vain tarvitsemiaan
+HARVEST_INPUTS = ["logging_intensity", "protWoodlands", "unprotectedForest"]
+SHARE_INPUTS = ["lumbershare", "papershare", "fuelshare"]
+LUMBER_SUPPLY_INPUTS = HARVEST_INPUTS + ["lumbershare", "import_lumber", "recovery_timber"]
 
-    # --- Alustetaan figuurit ---
-    bar_fig = dash.no_update
-    sankey_fig = dash.no_update  # aluksi None, luodaan vain validien osien perusteella
-
-    share_style_box = {
-        "flex": "1",
-        "display": "flex",
-        "flexDirection": "column",
-        "justifyContent": "flex-start",  # <--- FIX
-        "width": "100%",
-        "minWidth": "0",
-        "border": "1px solid #ddd",
-        "borderRadius": "12px",
-        "padding": "12px",
-        "marginBottom": "20px",
-        "boxShadow": "0 1px 2px rgba(0,0,0,0.05)",
-     #   "borderBottom": "3px double black",
-        "backgroundColor": "#d4f4dd"  # light red
-    }
-
-    sd_style_box_r = {
-        "flex": "1",
-        "display": "flex",
-        "flexDirection": "column",
-        "justifyContent": "flex-start",  # <--- FIX
-        "width": "100%",
-        "minWidth": "0",
-        "border": "4px solid #000",
-        "borderRadius": "12px",
-        "padding": "12px",
-        "marginBottom": "20px",
-        "boxShadow": "0 1px 2px rgba(0,0,0,0.05)",
-       # "borderBottom": "3px double black",
-        "backgroundColor": "#f4d4d4"
-    }
-
-    sd_style_box_g = {
-        "flex": "1",
-        "display": "flex",
-        "flexDirection": "column",
-        "justifyContent": "flex-start",  # <--- FIX
-        "width": "100%",
-        "minWidth": "0",
-        "border": "4px solid #000",
-        "borderRadius": "12px",
-        "padding": "12px",
-        "marginBottom": "20px",
-        "boxShadow": "0 1px 2px rgba(0,0,0,0.05)",
-     #   "borderBottom": "3px double black",
-        "backgroundColor": "#d4f4dd"
-    }
-
-    # --- 1️⃣ Capacity (lumber/paper/fuel) ---
-    if abs(total_shares - 100) > 0.01:
-        total_logging = data["logging_intensity"] * (((data["unprotectedForest"] + data["protWoodlands"]))/100 * 40000)
-        timber_supply = total_logging + data["import_lumber"] + data["import_paper"]
-        data["lumber"] = total_logging * (data["lumbershare"] / 100)
-
-        from_lumber_to_pulp = 0.333 * data["lumber"]
-        data["from_lumber_to_pulp"] = 0.333 * data["lumber"]
-        lumber_supply = round((data["lumbershare"] / 100 * total_logging) + data["import_lumber"] - data["from_lumber_to_pulp"] + data["recovery_timber"], -2)
-        status_text = f"{total_shares:.0f}% ❌ shares must equal 100%"
-        status_style = {"color": "red"}
-
-        share_style_box = {
-            "flex": "1",
-            "display": "flex",
-            "flexDirection": "column",
-            "justifyContent": "flex-start",  # <--- FIX
-            "width": "100%",
-            "minWidth": "0",
-            "border": "1px solid #ddd",
-            "borderRadius": "12px",
-            "padding": "12px",
-            "marginBottom": "20px",
-            "boxShadow": "0 1px 2px rgba(0,0,0,0.05)",
-         #   "borderBottom": "3px double black",
-            "backgroundColor": "#f4d4d4"  # light red
-        }
+SHARE_BOX_STYLE = {
+    "flex": "1",
+    "display": "flex",
+    "flexDirection": "column",
+    "justifyContent": "flex-start",  # <--- FIX
+    "width": "100%",
+    "minWidth": "0",
+    "border": "1px solid #ddd",
+    "borderRadius": "12px",
+    "padding": "12px",
+    "marginBottom": "20px",
+    "boxShadow": "0 1px 2px rgba(0,0,0,0.05)",
+}
 
+SD_BOX_STYLE = {
+    "flex": "1",
+    "display": "flex",
+    "flexDirection": "column",
+    "justifyContent": "flex-start",  # <--- FIX
+    "width": "100%",
+    "minWidth": "0",
+    "border": "4px solid #000",
+    "borderRadius": "12px",
+    "padding": "12px",
+    "marginBottom": "20px",
+    "boxShadow": "0 1px 2px rgba(0,0,0,0.05)",
+}
 
-      #  pulp_supply = (
-      #      (vals[INPUT_ORDER.index("paper")] or 0)
-      #                 + (vals[INPUT_ORDER.index("import_paper")] or 0)
-      #                 + (vals[INPUT_ORDER.index("from_lumber_to_pulp")] or 0)
-      #  )
-
-    #    fuel_supply = vals[INPUT_ORDER.index("fuelwood")] or 0
-
-      #  data["lumber"] = vals[INPUT_ORDER.index("lumber")] or 0
-       # data["paper"] = vals[INPUT_ORDER.index("paper")] or 0
-       # data["fuelwood"] = vals[INPUT_ORDER.index("fuelwood")] or 0
-        total_logging = dash.no_update
-        total_logging_text = dash.no_update
-        timber_supply = dash.no_update
-        timber_supply_text = dash.no_update
-       # lumber_supply = dash.no_update
-        lumber_supply_text = dash.no_update
-        pulp_supply = dash.no_update
-        pulp_supply_text = dash.no_update
-        fuel_supply = dash.no_update
-        fuel_supply_text = dash.no_update
-       # lumber_supply_text2 = dash.no_update
-    else:
-        total_logging = data["logging_intensity"] * (((data["unprotectedForest"] + data["protWoodlands"]))/100 * 40000)
-        total_logging_text = f"Total timber harvesting: {total_logging:,.0f} mcf"
-        timber_supply = total_logging + data["import_lumber"] + data["import_paper"]
-        timber_supply_text = f"Total roundwood market size: {timber_supply:,.0f} mcf"
-        data["lumber"] = total_logging * (data["lumbershare"] / 100)
-
-        from_lumber_to_pulp = 0.333 * data["lumber"]
-        data["from_lumber_to_pulp"] = 0.333 * data["lumber"]
-        lumber_supply = round((data["lumbershare"] / 100 * total_logging) + data["import_lumber"] - data["from_lumber_to_pulp"] + data["recovery_timber"], -2)
-        pulp_supply = round((data["papershare"] / 100 * total_logging) + data["import_paper"] + data["from_lumber_to_pulp"], -3)
-        fuel_supply = round((data["fuelshare"] / 100 * total_logging), -3)
-
-        data["paper"] = total_logging * (data["papershare"] / 100)
-        data["fuelwood"] = total_logging * (data["fuelshare"] / 100)
-
-        #bar_fig = make_stacked_bar(data)
-        status_text = f"{total_shares:.0f}% ✅ Balanced"
-        status_style = {"color": "green"}
-
-        lumber_supply_text = html.Span([
-            html.B("Lumber supply: "),
-            f"(after deduction of residues for pulp production): {round(lumber_supply, -2):,.0f} mcf"
-        ])
-       # lumber_demand_text = f"Demand {round(total_enduse, -2):,.0f}"
-        pulp_supply_text = html.Span([
-            html.B("Pulpwood supply: "),
-            f"{round(pulp_supply, -3):,.0f} mcf"
-        ])
 
-        fuel_supply_text = html.Span([
-            html.B("Fuelwood supply: "),
-            f"{round(fuel_supply, -3):,.0f} mcf"
-        ])
+def shares_balanced(lumbershare, papershare, fuelshare):
+    total_shares = (lumbershare or 0) + (papershare or 0) + (fuelshare or 0)
+    return abs(total_shares - 100) <= 0.01, total_shares
 
 
+# --- 1️⃣ Capacity (lumber/paper/fuel) ---
+@app.callback(
+    Output("capacity-status", "children"),
+    Output("capacity-status", "style"),
+    Output("share_style_box", "style"),
+    [Input(name, "value") for name in SHARE_INPUTS],
+)
+def update_share_status(lumbershare, papershare, fuelshare):
+    balanced, total_shares = shares_balanced(lumbershare, papershare, fuelshare)
+    if balanced:
+        return (f"{total_shares:.0f}% ✅ Balanced", {"color": "green"},
+                {**SHARE_BOX_STYLE, "backgroundColor": "#d4f4dd"})
+    return (f"{total_shares:.0f}% ❌ shares must equal 100%", {"color": "red"},
+            {**SHARE_BOX_STYLE, "backgroundColor": "#f4d4d4"})  # light red
 
-    # --- 2 End-use (loppukäyttö) ---
-    if abs(total_enduse - lumber_supply) > 5000:
-        lumber_supply_status_text = dash.no_update
-        lumber_supply_status_style = dash.no_update
 
+@app.callback(
+    Output("total_logging", "children"),
+    Output("timber_supply", "children"),
+    [Input(name, "value") for name in HARVEST_INPUTS + ["import_lumber", "import_paper"] + SHARE_INPUTS],
+)
+@coalesce()
+def update_harvest_totals(logging_intensity, prot, unprot, import_lumber, import_paper,
+                          lumbershare, papershare, fuelshare):
+    if not shares_balanced(lumbershare, papershare, fuelshare)[0]:
+        return dash.no_update, dash.no_update
 
-    else:
+    flows = flow_model.compute_flows_for({
+        "logging_intensity": logging_intensity,
+        "protWoodlands": prot,
+        "unprotectedForest": unprot,
+        "import_lumber": import_lumber,
+        "import_paper": import_paper,
+    })
+    return (f"Total timber harvesting: {flows['total_logging']:,.0f} mcf",
+            f"Total roundwood market size: {flows['timber_supply']:,.0f} mcf")
 
-        data["construction_multistory_val"] = int(data["construction_multistory_val"])
-        data["construction_single_val"] = int(data["construction_single_val"])
-        data["manufacturing_val"] = int(data["manufacturing_val"])
-        data["packaging_val"] = int(data["packaging_val"])
-        data["other_val"] = int(data["other_val"])
-        data["other_construction_val"] = int(data["other_construction_val"])
-        data["non_res_construction_val"] = int(data["non_res_construction_val"])
-      #  lumber_demand_text = f"Demand {round(total_enduse, -2):,.0f}"
-     #   lumber_demand_style = {"color": "red"}
-
-        lumber_supply_status_text = ("✅ Lumber supply and demand are in balance")
-        lumber_supply_status_style = {"color": "green"}
-
-     # --- Sankey-päivitys vain, jos molemmat balanssissa ---
-    if abs((total_shares - 100)) <= 0.01 and abs((total_enduse - lumber_supply)) > 5000:
-        sankey_fig = make_sankey(data)
-    else:
-        sankey_fig = make_sankey(data)
 
+@app.callback(
+    Output("lumber_supply_text", "children"),
+    [Input(name, "value") for name in LUMBER_SUPPLY_INPUTS] + [Input("papershare", "value"), Input("fuelshare", "value")],
+)
+@coalesce()
+def update_lumber_supply_text(logging_intensity, prot, unprot, lumbershare, import_lumber, recovery_timber,
+                              papershare, fuelshare):
+    if not shares_balanced(lumbershare, papershare, fuelshare)[0]:
+        return dash.no_update
 
+    flows = flow_model.compute_flows_for(dict(zip(
+        LUMBER_SUPPLY_INPUTS,
+        [logging_intensity, prot, unprot, lumbershare, import_lumber, recovery_timber])))
+    return html.Span([
+        html.B("Lumber supply: "),
+        f"(after deduction of residues for pulp production): {round(flows['lumber_supply'], -2):,.0f} mcf"
+    ])
 
 
-    # 1. Construction multistory
-    construction_multistory_str, inc_construction_multistory_pct = format_demand_change(
-        data["construction_multistory_val"], DEFAULTS["construction_multistory_val"]
-    )
+@app.callback(
+    Output("pulp_supply_text", "children"),
+    [Input(name, "value") for name in HARVEST_INPUTS + SHARE_INPUTS + ["import_paper"]],
+)
+@coalesce()
+def update_pulp_supply_text(logging_intensity, prot, unprot, lumbershare, papershare, fuelshare, import_paper):
+    if not shares_balanced(lumbershare, papershare, fuelshare)[0]:
+        return dash.no_update
 
-    # 2. Construction single
-    construction_single_str, inc_construction_single_pct = format_demand_change(
-        data["construction_single_val"], DEFAULTS["construction_single_val"]
-    )
+    flows = flow_model.compute_flows_for(dict(zip(
+        HARVEST_INPUTS + SHARE_INPUTS + ["import_paper"],
+        [logging_intensity, prot, unprot, lumbershare, papershare, fuelshare, import_paper])))
+    return html.Span([
+        html.B("Pulpwood supply: "),
+        f"{round(flows['pulp_supply'], -3):,.0f} mcf"
+    ])
 
-    # 3. Manufacturing
-    manufacturing_str, inc_manufacturing_pct = format_demand_change(
-        data["manufacturing_val"], DEFAULTS["manufacturing_val"]
-    )
 
-    # 4. Packaging
-    packaging_str, inc_packaging_pct = format_demand_change(
-        data["packaging_val"], DEFAULTS["packaging_val"]
-    )
+@app.callback(
+    Output("fuel_supply_text", "children"),
+    [Input(name, "value") for name in HARVEST_INPUTS + SHARE_INPUTS],
+)
+@coalesce()
+def update_fuel_supply_text(logging_intensity, prot, unprot, lumbershare, papershare, fuelshare):
+    if not shares_balanced(lumbershare, papershare, fuelshare)[0]:
+        return dash.no_update
 
-    # 5. Other
-    other_str, inc_other_pct = format_demand_change(
-        data["other_val"], DEFAULTS["other_val"]
-    )
+    flows = flow_model.compute_flows_for(dict(zip(
+        HARVEST_INPUTS + SHARE_INPUTS,
+        [logging_intensity, prot, unprot, lumbershare, papershare, fuelshare])))
+    return html.Span([
+        html.B("Fuelwood supply: "),
+        f"{round(flows['fuel_supply'], -3):,.0f} mcf"
+    ])
 
-    # 6. Non res. Construction
-    non_res_construction_str, inc_non_res_construction_pct = format_demand_change(
-        data["non_res_construction_val"], DEFAULTS["non_res_construction_val"]
-    )
 
-    # 7. Other Construction
-    other_construction_str, inc_other_construction_pct = format_demand_change(
-        data["other_construction_val"], DEFAULTS["other_construction_val"]
+@app.callback(
+    [Output(name, "max") for name in flow_model.END_USES],
+    [Input(name, "value") for name in LUMBER_SUPPLY_INPUTS],
+)
+@coalesce()
+def update_enduse_max(*vals):
+    """Loppukäyttökenttien maksimi = puutavaran tarjonta."""
+    flows = flow_model.compute_flows_for(dict(zip(LUMBER_SUPPLY_INPUTS, vals)))
+    lumber_supply = round(flows["lumber_supply"], -2)
+    return [lumber_supply] * len(flow_model.END_USES)
+
+
+# --- 2 End-use (loppukäyttö) ---
+def register_demand_change(name):
+    """Jokaisen loppukäyttökentän muutosprosentti omassa callbackissaan."""
+    @app.callback(
+        Output(name.replace("_val", "_change"), "children"),
+        Input(name, "value"),
     )
+    def update_demand_change(value):
+        text, _ = format_demand_change(float(value or 0), DEFAULTS[name])
+        return text
 
-    diff = total_enduse - lumber_supply
-    balanced_thousand = abs(diff) <= 5000
-
-    # --- Päivitä numerot aina ---
-    if balanced_thousand:
-        lumber_demand_text = html.Span([
-            html.B("Lumber demand: "),
-            f"{round(total_enduse, -2):,.0f} mcf balanced"
-        ])
-        lumber_supply_text2 = html.Span([
-            html.B("Lumber supply: "),
-            f"{round(lumber_supply, -2):,.0f} mcf balanced"
-        ])
 
-    else:
-        if diff > 5000:
-            # demand higher, supply lower
-            lumber_demand_text = html.Span([
-                html.B("Lumber demand: "),
-                f"{round(total_enduse, -2):,.0f} mcf 🟢 higher"
-            ])
-            lumber_supply_text2 = html.Span([
-                html.B("Lumber supply: "),
-                f"{round(lumber_supply, -2):,.0f} mcf 🔴 lower"
-            ])
+for _end_use in flow_model.END_USES:
+    register_demand_change(_end_use)
 
-        else:
-            # demand lower, supply higher
-            lumber_demand_text = html.Span([
-                html.B("Lumber demand: "),
-                f"{round(total_enduse, -2):,.0f} mcf 🔴 lower"
-            ])
-            lumber_supply_text2 = html.Span([
-                html.B("Lumber supply: "),
-                f"{round(lumber_supply, -2):,.0f} mcf 🟢 higher"
-            ])
-
-    # --- Päivitä sd_style_box ja status aina diffin mukaan ---
-    if balanced_thousand:
-        sd_style_box = sd_style_box_g
-        lumber_supply_status_text = html.H4("✅ Lumber supply and demand balanced", style = {"color": "green"})
-    else:
-        sd_style_box = sd_style_box_r
-        lumber_supply_status_text = html.H4("❌ Lumber supply and demand not in balance", style= {"color": "red"})
-
-    if triggered_id == "reset-btn-1":
-        reset_btn_1 =+ 1
-        for key in keys_btn1:
-            data[key] = DEFAULTS[key]
-        data["construction_multistory_val"] = (DEFAULTS["construction_multistory_val"])
-        # Recalculate dependent values
-        total_logging = data["logging_intensity"] * ((data["unprotectedForest"] + data["protWoodlands"]) / 100 * 40000)
-        print(total_logging)
-        data["lumber"] = total_logging * (data["lumbershare"] / 100)
-        data["from_lumber_to_pulp"] = 0.333 * data["lumber"]
-        data["paper"] = total_logging * (data["papershare"] / 100)
-        data["fuelwood"] = total_logging * (data["fuelshare"] / 100)
-        sankey_fig = make_sankey(data)
-
-    elif triggered_id == "reset-btn-2":
-        reset_btn_2 =+ 1
-        for key in keys_btn2:
-            data[key] = DEFAULTS[key]
-        # Recalculate dependent values if needed
-        total_logging = data["logging_intensity"] * ((data["unprotectedForest"] + data["protWoodlands"]) / 100 * 40000)
-        data["lumber"] = total_logging * (data["lumbershare"] / 100)
-        data["from_lumber_to_pulp"] = 0.333 * data["lumber"]
-        data["paper"] = total_logging * (data["papershare"] / 100)
-        data["fuelwood"] = total_logging * (data["fuelshare"] / 100)
-        sankey_fig = make_sankey(data)
-
-    return (
-        data,
-        sankey_fig,
-        status_text,
-        status_style,
-        share_style_box,
-        sd_style_box,
-        lumber_demand_text,
-        lumber_supply_status_text,
-        lumber_supply_status_style,
-        lumber_supply_text,
-        lumber_supply_text2,
-        pulp_supply_text,
-        fuel_supply_text,
-        total_logging_text,
-        timber_supply_text,
-        lumber_supply,
-        lumber_supply,
-        lumber_supply,
-        lumber_supply,
-        lumber_supply,
-        lumber_supply,
-        lumber_supply,
-        html.Span(construction_multistory_str),
-        html.Span(construction_single_str),
-        html.Span(manufacturing_str),
-        html.Span(packaging_str),
-        html.Span(other_str),
-        html.Span(non_res_construction_str),
-        html.Span(other_construction_str),
 
-    )
+# Tasapainon tila lasketaan selaimessa (assets/balance.js); palvelimelle lähtee
+# balance-hint-request vain silloin, kun tarjonta ja kysyntä eivät ole tasapainossa.
+app.clientside_callback(
+    ClientsideFunction(namespace="balance", function_name="update_status"),
+    Output("sd_style_box", "style"),
+    Output("lumber_demand_status", "children"),
+    Output("lumber_supply_status", "children"),
+    Output("lumber_supply_status", "style"),
+    Output("lumber_supply_text2", "children"),
+    Output("balance-hint-request", "data"),
+    [Input(name, "value") for name in LUMBER_SUPPLY_INPUTS + ["fuelshare"] + list(flow_model.END_USES)],
+    State("sankey-defaults", "data"),
+    State("balance-hint-request", "data"),
+)
 
 
 '''
@@ -2917,6 +2791,72 @@ def update_woodlands(wildlands):
     return round(new_woodlands, 2)
 '''
 
+@app.callback(
+    Output("balance-hint", "children"),
+    Input("balance-hint-request", "data"),
+)
+@coalesce()
+def update_balance_hint(current):
+    """Näyttää lähimmän tasapainossa olevan asetuksen valmiista taulukosta."""
+    # Tyhjä pyyntö = tasapainossa (assets/balance.js)
+    if not current:
+        return ""
+
+    setting = feasible_region.nearest_balanced_setting(current, BALANCE_TABLE)
+    if setting is None:
+        return html.Span("No balanced setting exists for this land cover and demand. "
+                         "Consider adjusting the lumber demand by enduse.")
+
+    return html.Span([
+        html.B("Nearest balanced setting: "),
+        f"timber harvesting {setting['logging_intensity']:g} mcf/acre, "
+        f"lumber share {setting['lumbershare']:.0f}% (pulpwood share {setting['papershare']:.0f}%), "
+        f"lumber import {setting['import_lumber']:,.0f} mcf, "
+        f"recovered lumber {setting['recovery_timber']:,.0f} mcf."
+    ])
+
+
+@app.callback(
+    Output("import_lumber", "value", allow_duplicate=True),
+    Output("logging_intensity", "value", allow_duplicate=True),
+    Input("auto-balance-btn", "n_clicks"),
+    [
+        State("logging_intensity", "value"),
+        State("protWoodlands", "value"),
+        State("unprotectedForest", "value"),
+        State("lumbershare", "value"),
+        State("import_lumber", "value"),
+        State("recovery_timber", "value"),
+    ] + [State(name, "value") for name in flow_model.END_USES],
+    prevent_initial_call=True
+)
+def auto_balance_lumber(n_clicks, logging_intensity, prot, unprot, lumbershare, import_lumber,
+                        recovery_timber, *end_uses):
+    """Ratkaisee tasapainottavan tuonnin (ja tarvittaessa hakkuutason) yhdellä kertaa."""
+    if not n_clicks:
+        raise dash.exceptions.PreventUpdate
+
+    # Tyhjä kenttä ei saa päätyä ratkaisijaan nollana (liukusäätimen minimi on 10)
+    intensity = DEFAULTS["logging_intensity"] if logging_intensity is None else logging_intensity
+
+    data = {
+        "logging_intensity": intensity,
+        "protWoodlands": prot,
+        "unprotectedForest": unprot,
+        "lumbershare": lumbershare,
+        "import_lumber": import_lumber,
+        "recovery_timber": recovery_timber,
+    }
+    data.update(zip(flow_model.END_USES, end_uses))
+
+    result = balance_solver.auto_balance(data)
+
+    new_intensity = balance_solver._snap(result["logging_intensity"], "logging_intensity")
+    if logging_intensity is not None and new_intensity == float(logging_intensity):
+        new_intensity = dash.no_update
+    return int(result["import_lumber"]), new_intensity
+
+
 # States for callback
 states = [State(k, "value") for k in DEFAULTS.keys()
           if k not in ["woodlands_area", "wildlands_area", "from_lumber_to_pulp", "lumber", "paper", "fuelwood","construction_multistory",
@@ -2962,6 +2902,7 @@ states += [
 
 )
 # --- Funktio Dash callbackiin ---
+@coalesce()
 def update_forest_chart(wild, prot, unprot, farm, dev, water):
     """
     Tarkistaa, että syötettyjen osien summa + water_wetlands on 100 %.
@@ -2983,10 +2924,76 @@ def update_forest_chart(wild, prot, unprot, farm, dev, water):
         }
         warning = f"✅ Shares sum to 100%",
 
-        fig = make_stacked_bar(values)
+        fig = patch_stacked_bar(values)
         return fig, warning, {"color": "green", "fontWeight": "bold", "marginBottom": "10px"}
 
 
+ORGANIZATION_LABELS = {o["value"]: o["label"] for o in organization_options}
+
+
+@app.callback(
+    Output("forest-bar", "figure", allow_duplicate=True),
+    Output("cohort-overlay-note", "children"),
+    Input("cohort-overlay", "value"),
+    Input("organization_type", "value"),
+    prevent_initial_call=True,
+)
+def update_cohort_overlay(mode, org_types):
+    """Shows or hides the respondents' 2060 band; reads only the precomputed cohort summary."""
+    patched = Patch()
+    overlay = patched["data"][len(LANDCOVER_CATEGORIES)]
+
+    if mode not in ("all", "org"):
+        overlay["visible"] = False
+        return patched, ""
+
+    band, org = cohort_summary.band(org_types if mode == "org" else None)
+    if band is None:
+        overlay["visible"] = False
+        return patched, "Not enough submitted responses to compare with yet."
+
+    boundaries = len(LANDCOVER_CATEGORIES) - 1
+    p10, p50, p90 = (band[k][:boundaries] for k in ("p10", "p50", "p90"))
+    overlay["visible"] = True
+    overlay["y"] = p50
+    overlay["error_y"]["array"] = [hi - mid for hi, mid in zip(p90, p50)]
+    overlay["error_y"]["arrayminus"] = [mid - lo for lo, mid in zip(p10, p50)]
+
+    note = f"Black bars: middle 80% of {band['n']} submitted responses"
+    if org is not None:
+        note += f" from {ORGANIZATION_LABELS.get(org, org)}"
+    elif mode == "org":
+        note += " (too few responses from your organization type, showing all respondents)"
+    return patched, note + "."
+
+
+# Sankey lasketaan selaimessa: liukusäätimen ja kenttien muutokset eivät kuormita palvelinta.
+# Palvelin tarkistaa arvot uudelleen vasta lähetettäessä (submit_responses_callback).
+app.clientside_callback(
+    ClientsideFunction(namespace="sankey", function_name="update_links"),
+    Output("sankey", "figure"),
+    Input("logging_intensity", "value"),
+    Input("protWoodlands", "value"),
+    Input("unprotectedForest", "value"),
+    Input("lumbershare", "value"),
+    Input("papershare", "value"),
+    Input("fuelshare", "value"),
+    Input("import_lumber", "value"),
+    Input("import_paper", "value"),
+    Input("recovery_timber", "value"),
+    Input("construction_multistory_val", "value"),
+    Input("construction_single_val", "value"),
+    Input("manufacturing_val", "value"),
+    Input("packaging_val", "value"),
+    Input("other_val", "value"),
+    Input("other_construction_val", "value"),
+    Input("non_res_construction_val", "value"),
+    State("sankey-defaults", "data"),
+    State("sankey", "figure"),
+    prevent_initial_call=True
+)
+
+
 # Callback to disable slider if "Cannot answer" is on
 @app.callback(
     Output({'type': 'importance-slider', 'index': dash.ALL}, 'disabled'),
@@ -3029,14 +3036,12 @@ def enforce_lumber_import(lumber, recovery_timber, construction_multistory, cons
 '''
 
 def save_responses_to_db(user_inputs, likert_answers, cannot_flags_dict):
-    conn = sqlite3.connect(DATA_DB_FILE)
-    c = conn.cursor()
-
-    # Convert lists or dicts to JSON strings
-    for key, value in list(user_inputs.items()):
-        if isinstance(value, (list, dict)):
-            user_inputs[key] = json.dumps(value)
-
+    """
+    Upserts the submitted answers, appends the respondent's buffered events
+    (failed attempts, resets, active time) and the submit itself, rewrites
+    the row's counters from the event log and replaces the respondent's
+    previous answers in the results aggregates, all in one transaction.
+    """
     full_data = {}
 
     full_data.update(user_inputs)
@@ -3047,27 +3052,28 @@ def save_responses_to_db(user_inputs, likert_answers, cannot_flags_dict):
     if not email:
         raise ValueError("Missing email")
 
-
-    cols = list(full_data.keys())
-    placeholders = ", ".join(["?"] * len(cols))
-    values = [full_data[cname] for cname in cols]
-
-    protected = {"reset_btn_1", "reset_btn_2", "id"}
-    update_cols = [cname for cname in cols if cname not in protected and cname != "email"]
-
-    update_clause = ", ".join([f"{col}=excluded.{col}" for col in update_cols])
-    update_clause += ", submit_count = COALESCE(responses.submit_count, 0) + 1"
-
-    sql = f"""
-        INSERT INTO responses ({', '.join(cols)})
-        VALUES ({placeholders})
-        ON CONFLICT(email) DO UPDATE SET
-        {update_clause}
-    """
-
-    c.execute(sql, values)
-    conn.commit()
-    conn.close()
+    values = []
+    for col in schema.SUBMIT_COLUMNS:
+        value = full_data.get(col)
+        # Convert lists or dicts to JSON strings
+        if isinstance(value, (list, dict)):
+            value = json.dumps(value)
+        values.append(value)
+
+    pending = counters.take(email)
+    conn = db.get_connection(DATA_DB_FILE)
+    try:
+        with conn:
+            conn.executemany(telemetry.INSERT_EVENTS_SQL, pending + [telemetry.event(email, "submit_count")])
+            previous = aggregates.old_submission(conn, email)
+            conn.execute(schema.UPSERT_SQL, values)
+            telemetry.materialize_counters(conn, [email])
+            aggregates.update_for_submit(conn, previous, full_data)
+    except Exception:
+        counters.restore(pending)
+        raise
+    finally:
+        invalidate_user_data([email])
 
 
 
@@ -3215,14 +3221,13 @@ def submit_responses_callback(
             + (waterandwetlands or 0)
     )
 
-    total_enduse = construction_multistory_val + construction_single_val + manufacturing_val + packaging_val + other_val + other_construction_val +non_res_construction_val
-    total_lumber_logging = (logging_intensity * (protwoodlands + unprotectedforest) / 100 * 40000) * (lumbershare/100)
-    from_lumber_to_pulp = total_lumber_logging * 0.333
-    print(total_lumber_logging)
-    lumber_supply = round(total_lumber_logging + import_lumber + recovery_timber - from_lumber_to_pulp, -2)
+    flows = flow_model.compute_flows_for(user_inputs)
+    user_inputs["from_lumber_to_pulp"] = flows["from_lumber_to_pulp"]
+    total_enduse = flows["total_enduse"]
+    lumber_supply = round(flows["lumber_supply"], -2)
 
 
-    diff = (lumber_supply or 0) - (total_enduse or 0)
+    diff = lumber_supply - total_enduse
 
     # 2. Check fuel + pulp + lumber share == 100
 
@@ -3241,32 +3246,16 @@ def submit_responses_callback(
         failed_share = True
 
     # 3. Check supply vs demand
-    if abs(diff) > 5000:
+    if abs(diff) > flow_model.BALANCE_TOLERANCE:
         failed_supply = True
 
-    # Log to DB for each failed check
-    conn = sqlite3.connect(DATA_DB_FILE)
-    cur = conn.cursor()
+    # Log each failed check (buffered, written in batches)
     if failed_landcover:
-        cur.execute("""
-            UPDATE responses
-            SET failed_attempts_landcover = failed_attempts_landcover + 1
-            WHERE email = ?
-        """, (user_email,))
+        counters.add(user_email, "failed_attempts_landcover", payload={"landcover_sum": landcover_sum})
     if failed_share:
-        cur.execute("""
-            UPDATE responses
-            SET failed_attempts_share = failed_attempts_share + 1
-            WHERE email = ?
-        """, (user_email,))
+        counters.add(user_email, "failed_attempts_share", payload={"share_sum": share_sum})
     if failed_supply:
-        cur.execute("""
-            UPDATE responses
-            SET failed_attempts_supply = failed_attempts_supply + 1
-            WHERE email = ?
-        """, (user_email,))
-    conn.commit()
-    conn.close()
+        counters.add(user_email, "failed_attempts_supply", payload={"supply": lumber_supply, "demand": total_enduse})
 
 
     if landcover_sum != 100:
@@ -3285,7 +3274,7 @@ def submit_responses_callback(
                         )
 
     # 3. Check supply = demand
-    if abs(diff) > 5000:
+    if abs(diff) > flow_model.BALANCE_TOLERANCE:
         return (html.Div(f"❌ Supply ({lumber_supply:,.0f}) and demand ({total_enduse:,.0f}) differ by more than 5,000 mcf. Fix the inputs.",
         style={"color": "red", "fontWeight": "bold", "marginTop": "10px"}),
                False,
@@ -3305,12 +3294,8 @@ def submit_responses_callback(
 
 def check_email(email, db_path=DATA_DB_FILE):
     """Hakee käyttäjän tiedot SQLite-kannasta sähköpostin perusteella."""
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT email FROM responses WHERE email = ?", (email,))
-    row = cursor.fetchone()
-    conn.close()
+    conn = db.get_connection(db_path)
+    row = conn.execute("SELECT email FROM responses WHERE email = ?", (email,)).fetchone()
 
 
     if row:
@@ -3322,86 +3307,50 @@ def check_email(email, db_path=DATA_DB_FILE):
 
 
 def fetch_user_data(email, db_path=DATA_DB_FILE):
-    """Hakee käyttäjän tiedot SQLite-kannasta sähköpostin perusteella ja dekoodaa JSON-kentät."""
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
+    """
+    Hakee käyttäjän tiedot SQLite-kannasta sähköpostin perusteella ja dekoodaa JSON-kentät.
+    Rivi pidetään välimuistissa, kunnes save_responses_to_db tai laskurit kirjoittavat sen.
+    """
+    cache_key = (db_path, email)
+    with _user_data_lock:
+        cached = _user_data_cache.get(cache_key)
+    if cached is not None:
+        return copy.deepcopy(cached)
+
+    conn = db.get_connection(db_path)
+    # row_factory kursorille, ettei jaetun yhteyden muut kyselyt muutu
     cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
 
     cursor.execute("SELECT * FROM responses WHERE email = ?", (email,))
     row = cursor.fetchone()
-    conn.close()
+    cursor.close()
 
     if not row:
         return None
 
     data = dict(row)
-    # JSON-dekoodaus automaattisesti
-    for key, value in data.items():
-        if isinstance(value, str):
+    # JSON-dekoodaus vain monivalintasarakkeille
+    for key in schema.JSON_COLUMNS:
+        value = data.get(key)
+        if isinstance(value, str) and value:
             try:
                 data[key] = json.loads(value)
-            except:
+            except ValueError:
                 pass
 
-    return data
+    with _user_data_lock:
+        if len(_user_data_cache) >= _USER_DATA_CACHE_SIZE:
+            _user_data_cache.clear()
+        _user_data_cache[cache_key] = data
+    return copy.deepcopy(data)
 
-def populate_form_from_db(db_data, likert_questions):
+def populate_form_from_db(db_data):
     """
     Luo yhden dictin, jossa kaikki oletusarvot survey-kentille.
     db_data = fetch_user_data(email) tulos (dict tai None)
     """
-    if not db_data:
-        db_data = {}
-
-    defaults = {
-        "lumbershare": db_data.get("lumbershare"),
-        "papershare": db_data.get("papershare"),
-        "fuelshare": db_data.get("fuelshare"),
-        "import_lumber": db_data.get("import_lumber"),
-        "import_paper": db_data.get("import_paper"),
-        "construction_multistory_val": db_data.get("construction_multistory_val"),
-        "construction_single_val": db_data.get("construction_single_val"),
-        "manufacturing_val": db_data.get("manufacturing_val"),
-        "packaging_val": db_data.get("packaging_val"),
-        "other_val": db_data.get("other_val"),
-        "other_construction_val": db_data.get("other_construction_val"),
-        "non_res_construction_val": db_data.get("non_res_construction_val"),
-        "recovery_timber": db_data.get("recovery_timber"),
-        "logging_intensity": db_data.get("logging_intensity"),
-
-        # 🔹 Nämä listat/dictit voivat olla JSON — varmistetaan dekoodaus
-        "state_checklist": db_data.get("state_checklist") or [],
-        "state_other": db_data.get("state_other"),
-        "organization_size": db_data.get("organization_size"),
-        "organization_type": db_data.get("organization_type"),
-        "organization_type_other": db_data.get("organization_type_other"),
-        "general_comment": db_data.get("general_comment") or "",
-        "prof_position": db_data.get("prof_position"),
-        "prof_position_other": db_data.get("prof_position_other"),
-        "years_experience": db_data.get("years_experience"),
-
-        # Kartat / alueet
-        "protWoodlands": db_data.get("protWoodlands"),
-        "unprotectedForest": db_data.get("unprotectedForest"),
-        "wildlands": db_data.get("wildlands"),
-        "farmland": db_data.get("farmland"),
-        "developed": db_data.get("developed"),
-        "waterAndWetlands": db_data.get("waterAndWetlands"),
-
-        "from_lumber_to_pulp": db_data.get("from_lumber_to_pulp"),
-
-    }
-
-    # 🔥 Lisätään myös kaikki Likert-kysymykset automaattisesti
-    for q in likert_questions:
-        q_id = q["id"]
-        defaults[q_id] = db_data.get(q_id)
-
-        # mahdollinen *_cannot_answer
-        cannot_key = f"{q_id}_cannot_answer"
-        defaults[cannot_key] = db_data.get(cannot_key, 0)
-
-    return defaults
+    return schema.form_values(db_data)
 
 
 def get_default(defaults, key):
@@ -3443,7 +3392,7 @@ function(n_intervals) {
     prevent_initial_call=True
 )
 def check_user_activity(n, last_active_ts, user_email):
-    """Update DB with elapsed time every interval"""
+    """Accumulate active time in the counter buffer; written with the next flush, at logout or at submit"""
     print("ollaan oltu aktiivisia")
     if not last_active_ts or not user_email:
         raise dash.exceptions.PreventUpdate
@@ -3453,18 +3402,9 @@ def check_user_activity(n, last_active_ts, user_email):
 
     inactivity_sec = now_ts - last_active_ts
 
-    # Päivitä responses-tauluun vain, jos ei liian pitkä passiivisuus
-    interval_sec = 30  # päivitys 30s välein
+    # Kasvatetaan aikaa vain, jos ei liian pitkä passiivisuus
     if inactivity_sec < 10 * 60:  # >10min pidetään passiivisena
-        conn = sqlite3.connect(DATA_DB_FILE)
-        c = conn.cursor()
-        c.execute("""
-            UPDATE responses
-            SET elapsed_time_seconds = COALESCE(elapsed_time_seconds, 0) + ?
-            WHERE email = ?
-        """, (interval_sec, user_email))
-        conn.commit()
-        conn.close()
+        counters.add(user_email, "elapsed_time_seconds", ACTIVITY_INTERVAL_SECONDS)
     else:
         print(f"User {user_email} inactive for {int(inactivity_sec/60)} min")
 
@@ -3472,6 +3412,76 @@ def check_user_activity(n, last_active_ts, user_email):
 
 
 
+# --- Responses export (admins only) ---
+EXPORT_CHUNK_ROWS = 500
+
+
+def _export_rows(db_path):
+    """
+    Yields (column names, then) decoded responses rows in chunks; one read
+    snapshot, own connection. Counters are summed from the events log.
+    """
+    conn = db.connect(db_path)
+    try:
+        cursor = conn.execute(telemetry.responses_query(conn) + " ORDER BY id")
+        names = [d[0] for d in cursor.description]
+        json_indexes = [names.index(name) for name in schema.JSON_COLUMNS if name in names]
+        yield names
+        while True:
+            chunk = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+            if not chunk:
+                break
+            for row in chunk:
+                row = list(row)
+                for i in json_indexes:
+                    try:
+                        row[i] = json.loads(row[i]) if row[i] else []
+                    except ValueError:
+                        pass  # jätetään tekstiksi
+                yield row
+    finally:
+        conn.close()
+
+
+def _export_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for n, row in enumerate(rows):
+        # Monivalinnat yhteen soluun puolipisteellä eroteltuina
+        writer.writerow(["; ".join(map(str, v)) if isinstance(v, list) else v for v in row])
+        if n % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _export_jsonl(rows):
+    names = next(rows)
+    for row in rows:
+        yield json.dumps(dict(zip(names, row)), ensure_ascii=False) + "\n"
+
+
+@server.route("/export/responses.<fmt>")
+def export_responses(fmt):
+    """Streams the responses table as CSV or JSON Lines to a logged-in admin."""
+    if not (session.get("logged_in") and is_admin(session.get("email"))):
+        abort(403)
+    # Puskurissa odottavat tapahtumat mukaan vientiin
+    counters.flush()
+    if fmt == "csv":
+        body, mimetype = _export_csv(_export_rows(DATA_DB_FILE)), "text/csv"
+    elif fmt == "jsonl":
+        body, mimetype = _export_jsonl(_export_rows(DATA_DB_FILE)), "application/x-ndjson"
+    else:
+        abort(404)
+
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    return Response(body, mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename=responses-{stamp}.{fmt}",
+    })
+
+
 if __name__ == "__main__":
     app.run(debug=True)
 
@@ -0,0 +1,101 @@
+// Sahatavaran tarjonnan ja kysynnän tasapaino selaimessa.
+// Sama laskenta kuin flow_model.compute_flows (lumber_supply, total_enduse).
+// Palvelimelle lähtee vain lähimmän tasapainon haku, ja vain kun tasapaino ei täyty.
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    balance: {
+        update_status: function (
+            logging_intensity, protWoodlands, unprotectedForest,
+            lumbershare, import_lumber, recovery_timber, fuelshare,
+            construction_multistory_val, construction_single_val, manufacturing_val,
+            packaging_val, other_val, other_construction_val, non_res_construction_val,
+            config, previous_request
+        ) {
+            function num(v) {
+                var n = parseFloat(v);
+                return isNaN(n) ? 0 : n;
+            }
+
+            function round100(v) {
+                return Math.round(v / 100) * 100;
+            }
+
+            function fmt(v) {
+                return v.toLocaleString("en-US", {maximumFractionDigits: 0});
+            }
+
+            function html(type, props) {
+                return {namespace: "dash_html_components", type: type, props: props};
+            }
+
+            function line(label, value, note) {
+                return html("Span", {children: [
+                    html("B", {children: label}),
+                    fmt(value) + " mcf " + note
+                ]});
+            }
+
+            var end_uses = [
+                construction_multistory_val, construction_single_val, manufacturing_val,
+                packaging_val, other_val, other_construction_val, non_res_construction_val
+            ].map(num);
+            var total_logging = num(logging_intensity) *
+                ((num(unprotectedForest) + num(protWoodlands)) / 100 * config.harvest_area_factor);
+            var lumber = total_logging * (num(lumbershare) / 100);
+            var lumber_supply = round100(
+                lumber + num(import_lumber) - config.lumber_to_pulp * lumber + num(recovery_timber)
+            );
+            var total_enduse = round100(end_uses.reduce(function (a, b) { return a + b; }, 0));
+
+            var diff = total_enduse - lumber_supply;
+            var balanced = Math.abs(diff) <= config.balance_tolerance;
+
+            var demand_text, supply_text;
+            if (balanced) {
+                demand_text = line("Lumber demand: ", total_enduse, "balanced");
+                supply_text = line("Lumber supply: ", lumber_supply, "balanced");
+            } else if (diff > 0) {
+                demand_text = line("Lumber demand: ", total_enduse, "🟢 higher");
+                supply_text = line("Lumber supply: ", lumber_supply, "🔴 lower");
+            } else {
+                demand_text = line("Lumber demand: ", total_enduse, "🔴 lower");
+                supply_text = line("Lumber supply: ", lumber_supply, "🟢 higher");
+            }
+
+            var color = balanced ? "green" : "red";
+            var box_style = Object.assign({}, config.sd_box_style, {
+                backgroundColor: balanced ? "#d4f4dd" : "#f4d4d4"
+            });
+            var status = html("H4", {
+                children: balanced ? "✅ Lumber supply and demand balanced"
+                                   : "❌ Lumber supply and demand not in balance",
+                style: {color: color}
+            });
+
+            // Tasapainossa vihjettä ei tarvita; tyhjennetään vain kerran
+            var request;
+            if (balanced) {
+                request = previous_request ? null : window.dash_clientside.no_update;
+            } else {
+                request = {
+                    logging_intensity: logging_intensity,
+                    protWoodlands: protWoodlands,
+                    unprotectedForest: unprotectedForest,
+                    lumbershare: lumbershare,
+                    fuelshare: fuelshare,
+                    import_lumber: import_lumber,
+                    recovery_timber: recovery_timber,
+                    construction_multistory_val: construction_multistory_val,
+                    construction_single_val: construction_single_val,
+                    manufacturing_val: manufacturing_val,
+                    packaging_val: packaging_val,
+                    other_val: other_val,
+                    other_construction_val: other_construction_val,
+                    non_res_construction_val: non_res_construction_val
+                };
+            }
+
+            return [box_style, demand_text, status, {color: color}, supply_text, request];
+        }
+    }
+});
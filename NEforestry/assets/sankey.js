@@ -0,0 +1,78 @@
+// Sankey-kaavion linkkien laskenta selaimessa.
+// Sama malli kuin flow_model.compute_flows ja app.py:n sankey_link_values / link_colors.
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    sankey: {
+        update_links: function (
+            logging_intensity, protWoodlands, unprotectedForest,
+            lumbershare, papershare, fuelshare,
+            import_lumber, import_paper, recovery_timber,
+            construction_multistory_val, construction_single_val, manufacturing_val,
+            packaging_val, other_val, other_construction_val, non_res_construction_val,
+            config, figure
+        ) {
+            if (!figure || !figure.data || !figure.data.length || !config) {
+                return window.dash_clientside.no_update;
+            }
+
+            function num(v) {
+                var n = parseFloat(v);
+                return isNaN(n) ? 0 : n;
+            }
+
+            function lerp(a, b, t) {
+                return Math.trunc(a + (b - a) * t);
+            }
+
+            function colorFromDiff(v, def) {
+                if (v < 1.1) {
+                    return "rgba(0,0,0,0)";  // transparent for tiny values
+                }
+                var diff = (v - def) / def;
+                var t = Math.min(1.0, Math.sqrt(Math.abs(diff)));
+                var target = diff > 0 ? [0, 255, 0] : [255, 0, 0];
+                return "rgb(" + lerp(180, target[0], t) + "," +
+                    lerp(180, target[1], t) + "," +
+                    lerp(180, target[2], t) + ")";
+            }
+
+            var defaults = config.defaults;
+            var total_logging = num(logging_intensity) *
+                ((num(unprotectedForest) + num(protWoodlands)) / 100 * config.harvest_area_factor);
+            var lumber = total_logging * (num(lumbershare) / 100);
+            var paper = total_logging * (num(papershare) / 100);
+            var fuelwood = total_logging * (num(fuelshare) / 100);
+            var from_lumber_to_pulp = config.lumber_to_pulp * lumber;
+
+            // järjestys = sankey_link_values
+            var values = [
+                lumber,
+                paper,
+                fuelwood,
+                num(import_lumber),
+                num(import_paper),
+                num(construction_multistory_val),
+                num(construction_single_val),
+                num(manufacturing_val),
+                num(packaging_val),
+                num(other_val),
+                num(other_construction_val),
+                num(non_res_construction_val),
+                1,
+                1,
+                num(recovery_timber),
+                from_lumber_to_pulp
+            ];
+            var colors = values.map(function (v, i) {
+                return colorFromDiff(v, defaults[i]);
+            });
+
+            var trace = Object.assign({}, figure.data[0]);
+            trace.link = Object.assign({}, trace.link, {value: values, color: colors});
+
+            var newFigure = Object.assign({}, figure);
+            newFigure.data = [trace].concat(figure.data.slice(1));
+            return newFigure;
+        }
+    }
+});
@@ -0,0 +1,20 @@
+// Jokaiselle välilehdelle (sivun latauskerralle) oma tunniste Dash-callbackien
+// pyyntöihin, jotta coalesce.py ei sekoita saman käyttäjän välilehtiä keskenään.
+
+(function () {
+    var tabId = (window.crypto && window.crypto.randomUUID)
+        ? window.crypto.randomUUID()
+        : Date.now().toString(36) + Math.random().toString(36).slice(2);
+
+    var originalFetch = window.fetch;
+    window.fetch = function (input, init) {
+        var url = typeof input === "string" ? input : (input && input.url) || "";
+        if (url.indexOf("_dash-update-component") !== -1) {
+            init = Object.assign({}, init);
+            var headers = new Headers(init.headers || {});
+            headers.set("X-Tab-Id", tabId);
+            init.headers = headers;
+        }
+        return originalFetch.call(this, input, init);
+    };
+})();
@@ -0,0 +1,77 @@
+"""
+Closed-form balancing of lumber supply against end-use demand.
+
+Lumber supply in flow_model is affine in both import_lumber and
+logging_intensity, so the balancing value of either one is solved exactly
+from two model evaluations instead of by trial and error.
+"""
+import numpy as np
+
+import flow_model
+
+
+def _snap(value, name):
+    """Clips a value to the input's (min, max) and rounds it to the input's step."""
+    lo, hi, step = flow_model.INPUT_BOUNDS[name]
+    return float(np.clip(np.round(value / step) * step, lo, hi))
+
+
+def _supply_line(data, name):
+    """Returns (slope, intercept) of lumber supply as a function of input `name`."""
+    at_zero = dict(data, **{name: 0})
+    at_one = dict(data, **{name: 1})
+    supply = flow_model.compute_flows(flow_model.scenario_matrix([at_zero, at_one]))["lumber_supply"]
+    return float(supply[1] - supply[0]), float(supply[0])
+
+
+def _demand(data):
+    return sum(float(data.get(name) or 0) for name in flow_model.END_USES)
+
+
+def solve_import_lumber(data):
+    """Lumber import that balances supply and demand, within the input bounds."""
+    slope, intercept = _supply_line(data, "import_lumber")
+    return _snap((_demand(data) - intercept) / slope, "import_lumber")
+
+
+def solve_logging_intensity(data):
+    """
+    Logging intensity that balances supply and demand, within the slider bounds.
+    Returns None when the lumber share or forest area is zero (supply does not
+    depend on intensity).
+    """
+    slope, intercept = _supply_line(data, "logging_intensity")
+    if slope <= 0:
+        return None
+    return _snap((_demand(data) - intercept) / slope, "logging_intensity")
+
+
+def auto_balance(data):
+    """
+    Balances lumber supply against demand by adjusting the lumber import first
+    and, if the import bounds are not enough, the logging intensity as well.
+    A missing logging intensity starts from its default.
+
+    Returns {"import_lumber", "logging_intensity", "lumber_supply", "total_enduse", "balanced"}.
+    """
+    data = dict(data)
+    if data.get("logging_intensity") is None:
+        data["logging_intensity"] = flow_model.DEFAULTS["logging_intensity"]
+    data["import_lumber"] = solve_import_lumber(data)
+
+    flows = flow_model.compute_flows_for(data)
+    if abs(flows["total_enduse"] - flows["lumber_supply"]) > flow_model.BALANCE_TOLERANCE:
+        intensity = solve_logging_intensity(data)
+        if intensity is not None:
+            data["logging_intensity"] = intensity
+            # tuonti uudelleen uudella hakkuutasolla
+            data["import_lumber"] = solve_import_lumber(data)
+            flows = flow_model.compute_flows_for(data)
+
+    return {
+        "import_lumber": data["import_lumber"],
+        "logging_intensity": _snap(float(data["logging_intensity"]), "logging_intensity"),
+        "lumber_supply": flows["lumber_supply"],
+        "total_enduse": flows["total_enduse"],
+        "balanced": abs(flows["total_enduse"] - flows["lumber_supply"]) <= flow_model.BALANCE_TOLERANCE,
+    }
@@ -0,0 +1,272 @@
+"""
+Offline clustering of the submitted 2060 visions.
+
+Every submitted response becomes one feature vector: the land cover, the
+harvest shares and logging intensity, imports and recovered timber, the end
+uses and the Likert answers. Each feature is standardized (z-score) so that
+the end uses in mcf do not outweigh the percentages, and missing answers
+("cannot answer" Likert items included) are set to the feature mean, i.e. 0
+after standardizing. The vectors are clustered with k-means (k-means++
+seeding, several restarts, best inertia kept), all in NumPy.
+
+Clusters are numbered by size, largest first. The run replaces the contents
+of scenario_clusters (label and distance to centroid per respondent) and
+cluster_centroids (centroids in the original units) in one transaction.
+
+    python clusters.py [--db data.db] [--k 5] [--restarts 8] [--seed 0]
+    python clusters.py --synthetic 50000   # timing on a generated panel, nothing is written
+"""
+import argparse
+import datetime
+import os
+import time
+
+import numpy as np
+
+import db
+import flow_model
+import schema
+import telemetry
+
+FEATURES = (
+    "protWoodlands", "unprotectedForest", "wildlands", "farmland", "developed", "waterAndWetlands",
+    "lumbershare", "papershare", "fuelshare", "logging_intensity",
+    "import_lumber", "import_paper", "recovery_timber",
+) + flow_model.END_USES + schema.LIKERT_IDS
+
+DEFAULT_K = 5
+DEFAULT_RESTARTS = 8
+MAX_ITER = 100
+
+SELECT_SQL = (
+    f"SELECT email, {', '.join(FEATURES)}, "
+    f"{', '.join(f'{q}_cannot_answer' for q in schema.LIKERT_IDS)} "
+    "FROM responses WHERE submit_count > 0 ORDER BY email"
+)
+
+CREATE_TABLES_SQL = (
+    """
+    CREATE TABLE IF NOT EXISTS scenario_clusters (
+        email TEXT PRIMARY KEY,
+        cluster INTEGER NOT NULL,
+        distance REAL NOT NULL,
+        run_at TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS cluster_centroids (
+        cluster INTEGER NOT NULL,
+        field TEXT NOT NULL,
+        value REAL NOT NULL,
+        size INTEGER NOT NULL,
+        run_at TEXT NOT NULL,
+        PRIMARY KEY (cluster, field)
+    )
+    """,
+)
+
+
+def load_features(conn):
+    """(emails, X): X is (N x len(FEATURES)) with NaN for missing and cannot-answer values."""
+    rows = conn.execute(SELECT_SQL).fetchall()
+    emails = [row[0] for row in rows]
+    n_features = len(FEATURES)
+
+    values = np.array([row[1:1 + n_features] for row in rows], dtype=np.float64).reshape(len(rows), n_features)
+    cannot = np.array([row[1 + n_features:] for row in rows], dtype=np.float64).reshape(len(rows), len(schema.LIKERT_IDS))
+    likert = values[:, n_features - len(schema.LIKERT_IDS):]
+    likert[np.nan_to_num(cannot, nan=0.0) > 0] = np.nan
+    return emails, values
+
+
+def standardize(X):
+    """(Z, mean, std): z-scores with missing values at 0; constant features get std 1."""
+    mean = np.nan_to_num(np.nanmean(X, axis=0), nan=0.0) if len(X) else np.zeros(X.shape[1])
+    std = np.nan_to_num(np.nanstd(X, axis=0), nan=0.0) if len(X) else np.ones(X.shape[1])
+    std[std == 0] = 1.0
+    return np.nan_to_num((X - mean) / std, nan=0.0), mean, std
+
+
+def _sq_distances(Z, Z_sq, centroids):
+    # |z - c|^2 = |z|^2 - 2 z.c + |c|^2, yksi matriisitulo kaikille pareille
+    d = Z_sq[:, None] - 2.0 * Z @ centroids.T + np.einsum("ij,ij->i", centroids, centroids)[None, :]
+    return np.maximum(d, 0.0, out=d)
+
+
+def _seed_centroids(Z, Z_sq, k, rng):
+    """k-means++: each new centroid is drawn with probability proportional to its squared distance."""
+    centroids = np.empty((k, Z.shape[1]))
+    centroids[0] = Z[rng.integers(len(Z))]
+    closest = _sq_distances(Z, Z_sq, centroids[:1])[:, 0]
+    for j in range(1, k):
+        total = closest.sum()
+        i = rng.choice(len(Z), p=closest / total) if total > 0 else rng.integers(len(Z))
+        centroids[j] = Z[i]
+        np.minimum(closest, _sq_distances(Z, Z_sq, centroids[j:j + 1])[:, 0], out=closest)
+    return centroids
+
+
+def _lloyd(Z, Z_sq, centroids, max_iter):
+    k = len(centroids)
+    labels = None
+    for _ in range(max_iter):
+        d = _sq_distances(Z, Z_sq, centroids)
+        new_labels = d.argmin(axis=1)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, Z)
+        for j in np.flatnonzero(counts == 0):
+            # Tyhjä ryhmä saa kauimmaisen pisteen, joka siirretään pois vanhasta ryhmästään;
+            # yhden pisteen ryhmistä ei oteta, ettei synny uutta tyhjää
+            far_d = d[np.arange(len(Z)), labels]
+            far_d[counts[labels] <= 1] = -1.0
+            far = far_d.argmax()
+            old = labels[far]
+            sums[old] -= Z[far]
+            counts[old] -= 1
+            sums[j], counts[j] = Z[far], 1
+            labels[far] = j
+        centroids = sums / counts[:, None]
+
+    d = _sq_distances(Z, Z_sq, centroids)
+    labels = d.argmin(axis=1)
+    inertia = d[np.arange(len(Z)), labels].sum()
+    return labels, centroids, inertia
+
+
+def kmeans(Z, k, restarts=DEFAULT_RESTARTS, max_iter=MAX_ITER, seed=0):
+    """
+    (labels, centroids, inertia) of the best of `restarts` k-means runs on Z.
+    Clusters are renumbered by size, largest first. k is capped at len(Z).
+    """
+    k = min(k, len(Z))
+    rng = np.random.default_rng(seed)
+    Z_sq = np.einsum("ij,ij->i", Z, Z)
+
+    best = None
+    for _ in range(restarts):
+        result = _lloyd(Z, Z_sq, _seed_centroids(Z, Z_sq, k, rng), max_iter)
+        if best is None or result[2] < best[2]:
+            best = result
+    labels, centroids, inertia = best
+
+    order = np.argsort(-np.bincount(labels, minlength=k), kind="stable")
+    rank = np.empty(k, dtype=np.int64)
+    rank[order] = np.arange(k)
+    return rank[labels], centroids[order], inertia
+
+
+def cluster(X, k=DEFAULT_K, restarts=DEFAULT_RESTARTS, seed=0):
+    """
+    Clusters the raw feature matrix X. Returns {"labels", "distances",
+    "centroids" (original units), "sizes", "inertia"}.
+    """
+    Z, mean, std = standardize(X)
+    labels, centroids, inertia = kmeans(Z, k, restarts=restarts, seed=seed)
+    distances = np.sqrt(np.maximum(((Z - centroids[labels]) ** 2).sum(axis=1), 0.0))
+    return {
+        "labels": labels,
+        "distances": distances,
+        "centroids": centroids * std + mean,
+        "sizes": np.bincount(labels, minlength=len(centroids)),
+        "inertia": float(inertia),
+    }
+
+
+def write_results(conn, emails, result, run_at):
+    """Replaces the stored clustering with `result`. The caller owns the transaction."""
+    conn.execute("DELETE FROM scenario_clusters")
+    conn.execute("DELETE FROM cluster_centroids")
+    conn.executemany(
+        "INSERT INTO scenario_clusters (email, cluster, distance, run_at) VALUES (?, ?, ?, ?)",
+        zip(emails, result["labels"].tolist(), result["distances"].tolist(), [run_at] * len(emails)),
+    )
+    conn.executemany(
+        "INSERT INTO cluster_centroids (cluster, field, value, size, run_at) VALUES (?, ?, ?, ?, ?)",
+        [
+            (j, name, float(value), int(result["sizes"][j]), run_at)
+            for j, centroid in enumerate(result["centroids"])
+            for name, value in zip(FEATURES, centroid)
+        ],
+    )
+
+
+def run(db_path, k=DEFAULT_K, restarts=DEFAULT_RESTARTS, seed=0):
+    """Clusters the submitted responses in `db_path` and stores the result; returns it (None if none)."""
+    conn = db.connect(db_path)
+    try:
+        # submit_count ajan tasalle tapahtumista ennen kuin sillä rajataan
+        with conn:
+            telemetry.materialize_counters(conn)
+        emails, X = load_features(conn)
+        if not emails:
+            return None
+        result = cluster(X, k, restarts, seed)
+        with conn:
+            write_results(conn, emails, result, datetime.datetime.now().isoformat(timespec="seconds"))
+        return result
+    finally:
+        conn.close()
+
+
+def synthetic_panel(n, archetypes=DEFAULT_K, seed=0):
+    """
+    (n x len(FEATURES)) panel of fake responses scattered around random
+    archetypes, within the survey's input ranges; about 5 % of the Likert
+    answers are missing. For timing and sanity checks only.
+    """
+    rng = np.random.default_rng(seed)
+    n_likert = len(schema.LIKERT_IDS)
+
+    # Maankäyttö ja hakkuuosuudet summautuvat sataan kuten kyselyssä
+    landcover = rng.dirichlet(np.full(6, 2.0), size=archetypes) * 100
+    shares = rng.dirichlet(np.full(3, 2.0), size=archetypes) * 100
+    intensity = rng.uniform(*flow_model.INPUT_BOUNDS["logging_intensity"][:2], size=(archetypes, 1))
+    supply = np.column_stack([
+        rng.uniform(0, flow_model.INPUT_BOUNDS[name][1], size=archetypes)
+        for name in ("import_lumber", "import_paper", "recovery_timber")
+    ])
+    end_uses = rng.dirichlet(np.full(len(flow_model.END_USES), 2.0), size=archetypes) * flow_model.TOTAL_DEMAND
+    likert = rng.integers(1, 6, size=(archetypes, n_likert)).astype(np.float64)
+    centers = np.hstack([landcover, shares, intensity, supply, end_uses, likert])
+
+    X = centers[rng.integers(archetypes, size=n)]
+    X *= rng.normal(1.0, 0.1, size=X.shape)
+    X[:, -n_likert:] = np.clip(np.rint(X[:, -n_likert:] + rng.normal(0, 0.5, size=(n, n_likert))), 1, 5)
+    X[:, -n_likert:][rng.random((n, n_likert)) < 0.05] = np.nan
+    return np.maximum(X, 0.0)
+
+
+if __name__ == "__main__":
+    ENV = os.getenv("FLASK_ENV", "development")  # oletus development
+
+    if ENV == "production":
+        DATA_DB_FILE = "/home/hulicupter/flask_app/NEforestry/data.db"
+    else:
+        DATA_DB_FILE = "data.db"
+
+    parser = argparse.ArgumentParser(description="Cluster the submitted scenarios with k-means.")
+    parser.add_argument("--db", default=DATA_DB_FILE)
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="number of clusters")
+    parser.add_argument("--restarts", type=int, default=DEFAULT_RESTARTS, help="k-means++ restarts, best kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--synthetic", type=int, metavar="N", help="cluster N generated rows instead; writes nothing")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.synthetic:
+        result = cluster(synthetic_panel(args.synthetic, args.k, args.seed), args.k, args.restarts, args.seed)
+        n = args.synthetic
+    else:
+        result = run(args.db, args.k, args.restarts, args.seed)
+        if result is None:
+            raise SystemExit("No submitted responses to cluster.")
+        n = len(result["labels"])
+    elapsed = time.perf_counter() - started
+
+    print(f"{n} scenarios in {len(result['sizes'])} clusters in {elapsed:.2f} s (inertia {result['inertia']:.1f})")
+    print("Cluster sizes:", ", ".join(str(size) for size in result["sizes"]))
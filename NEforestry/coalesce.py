@@ -0,0 +1,84 @@
+"""
+Server-side coalescing of bursty callback inputs.
+
+Slider ticks and NumericInput clicks fire one callback per intermediate value.
+A callback wrapped with @coalesce() drops results that a newer value from the
+same browser tab has overtaken while computing: they return PreventUpdate, so
+the browser keeps showing the result of the newest value.
+
+Optionally, with COALESCE_WINDOW_MS > 0, later values of a burst also wait for
+the window to close and only the newest one is computed. The wait holds the
+worker thread, so it only pays off on a threaded server where requests
+overlap; the default is 0 (no wait). On a single worker requests never
+overlap and the wrapper costs one dict lookup.
+
+Tabs are told apart by the X-Tab-Id header that assets/tab_id.js adds to
+Dash callback requests, so two tabs of the same user never cancel each
+other's updates.
+"""
+import functools
+import os
+import threading
+import time
+
+from dash.exceptions import PreventUpdate
+from flask import request, session
+
+# Ikkuna millisekunteina, säädettävissä ympäristömuuttujalla
+COALESCE_WINDOW = float(os.getenv("COALESCE_WINDOW_MS", "0")) / 1000
+
+# Vanhat istunnot siivotaan, kun tilaa on kertynyt näin monelle avaimelle
+_MAX_KEYS = 10000
+_STALE_SECONDS = 600
+
+# (istunto, välilehti, callback) -> [viimeisin järjestysnumero, viimeisimmän ajon alkuhetki]
+_state = {}
+_lock = threading.Lock()
+
+
+def _session_key():
+    # Välilehden tunniste tulee assets/tab_id.js:ltä; ilman sitä koko istunto on yksi avain
+    return session.get("email") or request.remote_addr, request.headers.get("X-Tab-Id")
+
+
+def _prune(now):
+    stale = [key for key, (_, last) in _state.items() if now - last > _STALE_SECONDS]
+    for key in stale:
+        del _state[key]
+
+
+def coalesce(window=None):
+    """Decorator for Dash callback functions; `window` in seconds overrides COALESCE_WINDOW."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            wait_window = COALESCE_WINDOW if window is None else window
+            key = (*_session_key(), func)
+            now = time.monotonic()
+
+            with _lock:
+                if len(_state) > _MAX_KEYS:
+                    _prune(now)
+                entry = _state.setdefault(key, [0, 0.0])
+                entry[0] += 1
+                seq = entry[0]
+                wait = entry[1] + wait_window - now
+
+            if wait > 0:
+                time.sleep(wait)
+                with _lock:
+                    if entry[0] != seq:
+                        raise PreventUpdate  # uudempi arvo on jo tulossa
+
+            with _lock:
+                entry[1] = time.monotonic()
+
+            result = func(*args, **kwargs)
+
+            with _lock:
+                if entry[0] != seq:
+                    raise PreventUpdate  # ohitettu laskennan aikana
+            return result
+
+        return wrapper
+    return decorator
@@ -0,0 +1,115 @@
+"""
+Respondent cohort bands for the land-cover chart.
+
+The chart stacks the six land-cover shares, so the band is computed on the
+stacked boundaries: for each category, the cumulative share of it and the
+categories below it, over the submitted responses. The 10th, 50th and 90th
+percentile of each boundary are kept for all respondents and for each
+organization type. The viewer's own response is included when they have
+submitted; a group is only kept when it has more than MIN_GROUP_SIZE
+respondents, so that even then the band rests on at least MIN_GROUP_SIZE
+other answers and no small group's answers can be read off the chart.
+Respondents who chose several organization types count in each of them.
+
+The summary is recomputed every REFRESH_SECONDS on a background thread
+(start()), so callbacks only read the latest snapshot. Without threads,
+get() refreshes inline once the snapshot is clearly stale.
+"""
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+import db
+
+# Sama järjestys kuin app.py:n LANDCOVER_CATEGORIES (pinoamisjärjestys)
+CATEGORIES = ("wildlands", "protWoodlands", "unprotectedForest", "farmland", "developed", "waterAndWetlands")
+
+MIN_GROUP_SIZE = 5
+REFRESH_SECONDS = float(os.getenv("COHORT_REFRESH_SECONDS", "300"))
+
+SELECT_SQL = f"SELECT organization_type, {', '.join(CATEGORIES)} FROM responses WHERE submit_count > 0"
+
+
+def _band(cumulative):
+    p10, p50, p90 = np.percentile(cumulative, [10, 50, 90], axis=0)
+    return {"n": len(cumulative), "p10": p10.tolist(), "p50": p50.tolist(), "p90": p90.tolist()}
+
+
+def compute_summary(conn, min_group=MIN_GROUP_SIZE):
+    """{"overall": band or None, "by_org": {organization type: band}}; band lists follow CATEGORIES."""
+    rows = conn.execute(SELECT_SQL).fetchall()
+    # Katsoja voi olla mukana ryhmässä: vähintään min_group muuta vastausta
+    if len(rows) <= min_group:
+        return {"overall": None, "by_org": {}}
+
+    shares = np.nan_to_num(np.array([row[1:] for row in rows], dtype=np.float64), nan=0.0)
+    cumulative = np.cumsum(shares, axis=1)
+
+    members = {}
+    for i, row in enumerate(rows):
+        try:
+            types = json.loads(row[0]) if row[0] else []
+        except ValueError:
+            types = []
+        for org in types if isinstance(types, list) else []:
+            members.setdefault(org, []).append(i)
+
+    return {
+        "overall": _band(cumulative),
+        "by_org": {org: _band(cumulative[idx]) for org, idx in members.items() if len(idx) > min_group},
+    }
+
+
+class CohortSummary:
+    """Latest compute_summary() of `db_path`, refreshed periodically."""
+
+    def __init__(self, db_path, refresh_seconds=REFRESH_SECONDS):
+        self.db_path = db_path
+        self.refresh_seconds = refresh_seconds
+        self._summary = None
+        self._computed_at = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def refresh(self):
+        summary = compute_summary(db.get_connection(self.db_path))
+        with self._lock:
+            self._summary = summary
+            self._computed_at = time.monotonic()
+        return summary
+
+    def get(self):
+        with self._lock:
+            summary, computed_at = self._summary, self._computed_at
+        if summary is None or time.monotonic() - computed_at > 2 * self.refresh_seconds:
+            return self.refresh()
+        return summary
+
+    def band(self, org_types=None):
+        """
+        (band, organization type or None): the first of `org_types` that has
+        a band, otherwise the overall band. band is None before enough responses.
+        """
+        summary = self.get()
+        for org in org_types or []:
+            if org in summary["by_org"]:
+                return summary["by_org"][org], org
+        return summary["overall"], None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="cohort-refresh", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                # Mikä tahansa virhe pysäyttäisi säikeen hiljaa; yritetään seuraavalla kierroksella
+                print(f"Cohort summary refresh failed, retrying later: {e}")
+            time.sleep(self.refresh_seconds)
@@ -0,0 +1,61 @@
+"""
+Consensus of the submitted 2060 visions for the thank-you page Sankey.
+
+Every submitted scenario is run through the vectorized flow model, and the
+25th, 50th and 75th percentile of each Sankey flow is taken over the
+respondents. Each flow is summarised separately, so the median Sankey shows
+typical flow sizes rather than one respondent's balanced scenario. Nothing
+is summarised before MIN_RESPONDENTS have submitted: with fewer, the median
+would be (close to) one respondent's own answers.
+
+submissions_signature() changes whenever anyone submits (it is the id of
+the newest submit event), so a cached figure can be reused until then. The
+lookup uses idx_events_event and costs one index probe.
+"""
+import numpy as np
+
+import flow_model
+
+# Sankeyn virrat: mallin laskemat + suoraan syötetyt
+FLOW_FIELDS = ("lumber", "paper", "fuelwood", "from_lumber_to_pulp")
+INPUT_FIELDS = ("import_lumber", "import_paper", "recovery_timber") + flow_model.END_USES
+
+# Sama raja kuin cohorts.MIN_GROUP_SIZE
+MIN_RESPONDENTS = 5
+
+SELECT_SCENARIOS_SQL = f"SELECT {', '.join(flow_model.INPUTS)} FROM responses WHERE submit_count > 0"
+
+SIGNATURE_SQL = "SELECT MAX(id) FROM events WHERE event = 'submit_count'"
+
+
+def submissions_signature(conn):
+    return conn.execute(SIGNATURE_SQL).fetchone()[0]
+
+
+def load_scenarios(conn):
+    """(N x len(flow_model.INPUTS)) array of the submitted scenarios; missing values count as 0."""
+    rows = conn.execute(SELECT_SCENARIOS_SQL).fetchall()
+    X = np.array(rows, dtype=np.float64).reshape(len(rows), len(flow_model.INPUTS))
+    return np.nan_to_num(X, nan=0.0)
+
+
+def flow_quantiles(X, min_respondents=MIN_RESPONDENTS):
+    """
+    Returns {"n", "q1", "median", "q3"}, where the quantile entries map each
+    Sankey flow name to its value over the scenarios. None if X has fewer
+    than `min_respondents` rows.
+    """
+    if len(X) == 0 or len(X) < min_respondents:
+        return None
+
+    flows = flow_model.compute_flows(X)
+    columns = [flows[name] for name in FLOW_FIELDS] + [X[:, flow_model.INPUT_INDEX[name]] for name in INPUT_FIELDS]
+    q1, median, q3 = np.percentile(np.column_stack(columns), [25, 50, 75], axis=0)
+
+    names = FLOW_FIELDS + INPUT_FIELDS
+    return {
+        "n": len(X),
+        "q1": dict(zip(names, q1.tolist())),
+        "median": dict(zip(names, median.tolist())),
+        "q3": dict(zip(names, q3.tolist())),
+    }
@@ -0,0 +1,49 @@
+"""
+Shared SQLite connections for data.db and users.db.
+
+Each worker thread keeps one open connection per database file instead of
+connecting for every query. Connections run in WAL mode, so respondents
+reading their saved answers do not block on another respondent's write, and
+a busy timeout makes concurrent writers wait for the lock instead of failing
+with "database is locked".
+
+Use the connection as a context manager for writes:
+    conn = db.get_connection(DATA_DB_FILE)
+    with conn:
+        conn.execute("UPDATE ...", (...))
+"""
+import os
+import sqlite3
+import threading
+
+# Kuinka kauan kirjoittaja odottaa lukkoa ennen virhettä
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Sivuvälimuisti yhteyttä kohden (KiB)
+CACHE_SIZE_KB = 8192
+
+_local = threading.local()
+
+
+def connect(path):
+    """Opens a new tuned connection (scripts and one-off jobs)."""
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # WAL + NORMAL: commit ei odota fsynciä, tietokanta pysyy eheänä
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    return conn
+
+
+def get_connection(path):
+    """Returns this thread's connection to `path`, opening it on first use."""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    key = os.path.abspath(path)
+    conn = connections.get(key)
+    if conn is None:
+        conn = connections[key] = connect(path)
+    return conn
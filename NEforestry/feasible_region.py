@@ -0,0 +1,131 @@
+"""
+Precomputed sweep of the lumber supply/demand balance.
+
+Domestic net lumber supply (harvested lumber minus the residue sent to pulp)
+is tabulated over the logging intensity slider, the lumber share and the
+combined protected + unprotected forest share. Imports and recovered lumber
+are additive, and the supply is linear in the forest share, so for a given
+end-use demand the survey can look up the nearest balanced setting from the
+2-D slice interpolated between the two nearest forest shares.
+
+Run offline to write the table next to the app:
+    python feasible_region.py
+If the file is missing, the app builds the same table in memory at startup.
+"""
+import os
+
+import numpy as np
+
+import flow_model
+
+TABLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "feasible_region.npz")
+
+# Muutosten painotus etäisyydessä: muutos suhteessa kentän vaihteluväliin
+_DISTANCE_VARIABLES = ("logging_intensity", "lumbershare", "import_lumber", "recovery_timber")
+
+
+def _axis(name):
+    lo, hi, step = flow_model.INPUT_BOUNDS[name]
+    return np.arange(lo, hi + step / 2, step, dtype=np.float64)
+
+
+def build_table():
+    """Sweeps the flow model over intensity x lumber share x forest share."""
+    intensity = _axis("logging_intensity")
+    lumbershare = _axis("lumbershare")
+    forest_share = np.arange(0, 101, 1, dtype=np.float64)
+
+    # Yksi metsäosuus kerrallaan: intensity x lumbershare -ruudukko
+    grid_intensity, grid_share = np.meshgrid(intensity, lumbershare, indexing="ij")
+    X = np.zeros((grid_intensity.size, len(flow_model.INPUTS)), dtype=np.float64)
+    X[:, flow_model.INPUT_INDEX["logging_intensity"]] = grid_intensity.ravel()
+    X[:, flow_model.INPUT_INDEX["lumbershare"]] = grid_share.ravel()
+
+    net_lumber = np.empty((intensity.size, lumbershare.size, forest_share.size), dtype=np.float32)
+    for k, share in enumerate(forest_share):
+        # koko metsäosuus suojelemattomaan; kaava käyttää vain summaa
+        X[:, flow_model.INPUT_INDEX["unprotectedForest"]] = share
+        flows = flow_model.compute_flows(X)
+        # tuonti, kierrätys ja loppukäyttö = 0 -> lumber_supply on kotimainen nettotarjonta
+        net_lumber[:, :, k] = flows["lumber_supply"].reshape(grid_intensity.shape)
+
+    return {
+        "logging_intensity": intensity,
+        "lumbershare": lumbershare,
+        "forest_share": forest_share,
+        "net_lumber": net_lumber,
+    }
+
+
+def save_table(table, path=TABLE_FILE):
+    np.savez_compressed(path, **table)
+
+
+def load_table(path=TABLE_FILE):
+    """Loads the table written by save_table, or builds it if the file is missing."""
+    if os.path.exists(path):
+        with np.load(path) as npz:
+            return {name: npz[name] for name in npz.files}
+    return build_table()
+
+
+def nearest_balanced_setting(current, table):
+    """
+    Returns the balanced setting closest to `current` (a dict of survey inputs)
+    for its land cover, or None if no setting within the input bounds balances.
+    Land cover and the fuelwood share are kept; the pulpwood share absorbs the
+    change in the lumber share so that shares still sum to 100%.
+    """
+    def value(name):
+        v = current.get(name)
+        return float(v) if v is not None else 0.0
+
+    # Nettotarjonta on lineaarinen metsäosuudessa: interpoloidaan viereisten viipaleiden välillä
+    shares = table["forest_share"]
+    forest = float(np.clip(value("protWoodlands") + value("unprotectedForest"), shares[0], shares[-1]))
+    k = min(int(np.searchsorted(shares, forest, side="right")) - 1, shares.size - 2)
+    t = (forest - shares[k]) / (shares[k + 1] - shares[k])
+    net = (1 - t) * table["net_lumber"][:, :, k].astype(np.float64) + t * table["net_lumber"][:, :, k + 1]
+
+    intensity = table["logging_intensity"][:, np.newaxis]
+    lumbershare = table["lumbershare"][np.newaxis, :]
+
+    demand = sum(value(name) for name in flow_model.END_USES)
+    need = demand - net  # tuonnin + kierrätyksen tarve
+
+    imp_lo, imp_hi, imp_step = flow_model.INPUT_BOUNDS["import_lumber"]
+    rec_lo, rec_hi, rec_step = flow_model.INPUT_BOUNDS["recovery_timber"]
+
+    # Ensin tuonti, kierrätetty puu pidetään ennallaan jos mahdollista
+    recovery = np.full(need.shape, np.clip(value("recovery_timber"), rec_lo, rec_hi))
+    imports = np.clip(np.round((need - recovery) / imp_step) * imp_step, imp_lo, imp_hi)
+    recovery = np.clip(np.round((need - imports) / rec_step) * rec_step, rec_lo, rec_hi)
+
+    feasible = np.abs(need - imports - recovery) <= flow_model.BALANCE_TOLERANCE
+    feasible &= lumbershare <= 100 - value("fuelshare")
+    if not feasible.any():
+        return None
+
+    candidate = {
+        "logging_intensity": np.broadcast_to(intensity, need.shape),
+        "lumbershare": np.broadcast_to(lumbershare, need.shape),
+        "import_lumber": imports,
+        "recovery_timber": recovery,
+    }
+    distance = np.zeros(need.shape)
+    for name in _DISTANCE_VARIABLES:
+        lo, hi, _ = flow_model.INPUT_BOUNDS[name]
+        distance += np.abs(candidate[name] - value(name)) / (hi - lo)
+    distance[~feasible] = np.inf
+
+    i, j = np.unravel_index(np.argmin(distance), distance.shape)
+    setting = {name: float(candidate[name][i, j]) for name in _DISTANCE_VARIABLES}
+    setting["papershare"] = 100 - setting["lumbershare"] - value("fuelshare")
+    setting["lumber_supply"] = float(net[i, j] + imports[i, j] + recovery[i, j])
+    return setting
+
+
+if __name__ == "__main__":
+    table = build_table()
+    save_table(table)
+    print(f"Feasible-region table written to {TABLE_FILE} ({table['net_lumber'].nbytes / 1e6:.1f} MB uncompressed).")
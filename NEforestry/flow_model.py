@@ -0,0 +1,156 @@
+"""
+Forest-flow model: harvest, assortment split, lumber-to-pulp residue,
+supply and end-use demand.
+
+The same formulas are used by the survey callbacks (one scenario at a time)
+and by analysis scripts (thousands of stored scenarios at once), so the
+kernel works on an (N x len(INPUTS)) array and returns one array per flow.
+"""
+import numpy as np
+
+# Hakkuupinta-ala: (suojeltu + suojelematon metsä %) / 100 * 40000
+HARVEST_AREA_FACTOR = 40000
+
+# Sahatavaran sivuvirta massateollisuuteen
+LUMBER_TO_PULP = 0.333
+
+# Kysynnän ja tarjonnan sallittu ero (mcf)
+BALANCE_TOLERANCE = 5000
+
+# Syöttökenttien rajat (min, max, step), samat kuin survey_layoutin kentissä
+INPUT_BOUNDS = {
+    "logging_intensity": (10, 45, 0.5),
+    "lumbershare": (0, 100, 1),
+    "papershare": (0, 100, 1),
+    "fuelshare": (0, 100, 1),
+    "import_lumber": (0, 500000, 100),
+    "import_paper": (0, 500000, 100),
+    "recovery_timber": (0, 20000, 100),
+}
+
+# Loppukäytön kokonaiskysyntä 2020 (mcf)
+TOTAL_DEMAND = 382452.3
+
+# 2020-lähtötilanne: kyselyn oletusarvot ja Sankeyn vertailukohta
+DEFAULTS = {
+    "protWoodlands": 21, #20.94,
+    "unprotectedForest": 57, #58.49,
+    "wildlands": 2, #1.52,
+    "farmland": 5, #5.25,
+    "developed": 10, #9.9,
+    "waterAndWetlands": 5,
+    "woodlands_area": 30.31,
+    "wildlands_area": 1.29,
+    "lumber": 336960,
+    "lumbershare": 40,
+    "paper": 336960,
+    "papershare": 40,
+    "from_lumber_to_pulp": 112207.68,
+    "fuelwood": 168480,
+    "fuelshare": 20,
+    "import_lumber": 150000,
+    "import_paper": 115000,
+    "construction_multistory": 5,
+    "construction_multistory_val": round(TOTAL_DEMAND * 0.05,- 2),
+    "construction_single": 26,
+    "construction_single_val": round(TOTAL_DEMAND * 0.26, -2),
+    "manufacturing": 12,
+    "manufacturing_val": round(TOTAL_DEMAND * 0.12, -2),
+    "packaging": 13,
+    "packaging_val": round(TOTAL_DEMAND * 0.13, -2),
+    "other": 9,
+    "other_val": round(TOTAL_DEMAND * 0.09, -2),
+    "other_construction": 28,   #residential repair and remodeling
+    "other_construction_val": round(TOTAL_DEMAND * 0.28, -2),
+    "non_res_construction": 7,
+    "non_res_construction_val": round(TOTAL_DEMAND * 0.07, -2),
+    "recovery_timber": 8000,
+    "logging_intensity": 27
+}
+
+END_USES = (
+    "construction_multistory_val",
+    "construction_single_val",
+    "manufacturing_val",
+    "packaging_val",
+    "other_val",
+    "other_construction_val",
+    "non_res_construction_val",
+)
+
+# Kernelin syötesarakkeet, järjestys = scenario-matriisin sarakkeet
+INPUTS = (
+    "logging_intensity",
+    "protWoodlands",
+    "unprotectedForest",
+    "lumbershare",
+    "papershare",
+    "fuelshare",
+    "import_lumber",
+    "import_paper",
+    "recovery_timber",
+) + END_USES
+
+INPUT_INDEX = {name: i for i, name in enumerate(INPUTS)}
+
+
+def scenario_matrix(rows):
+    """
+    Builds the (N x len(INPUTS)) input array from an iterable of dicts
+    (callback data, DB rows). Missing and None values count as 0.
+    """
+    rows = list(rows)
+    X = np.zeros((len(rows), len(INPUTS)), dtype=np.float64)
+    for r, row in enumerate(rows):
+        for name, i in INPUT_INDEX.items():
+            value = row.get(name)
+            if value is not None:
+                X[r, i] = float(value)
+    return X
+
+
+def compute_flows(scenarios):
+    """
+    Vectorized flow model. `scenarios` is an (N x len(INPUTS)) array
+    (a single 1-D row is also accepted). Returns {flow name: array of N}.
+    """
+    X = np.asarray(scenarios, dtype=np.float64)
+    if X.ndim == 1:
+        X = X[np.newaxis, :]
+
+    def col(name):
+        return X[:, INPUT_INDEX[name]]
+
+    total_logging = col("logging_intensity") * ((col("unprotectedForest") + col("protWoodlands")) / 100 * HARVEST_AREA_FACTOR)
+
+    lumber = total_logging * (col("lumbershare") / 100)
+    paper = total_logging * (col("papershare") / 100)
+    fuelwood = total_logging * (col("fuelshare") / 100)
+    from_lumber_to_pulp = LUMBER_TO_PULP * lumber
+
+    lumber_supply = lumber + col("import_lumber") - from_lumber_to_pulp + col("recovery_timber")
+    pulp_supply = paper + col("import_paper") + from_lumber_to_pulp
+    fuel_supply = fuelwood
+    timber_supply = total_logging + col("import_lumber") + col("import_paper")
+
+    total_enduse = X[:, [INPUT_INDEX[name] for name in END_USES]].sum(axis=1)
+
+    return {
+        "total_logging": total_logging,
+        "lumber": lumber,
+        "paper": paper,
+        "fuelwood": fuelwood,
+        "from_lumber_to_pulp": from_lumber_to_pulp,
+        "lumber_supply": lumber_supply,
+        "pulp_supply": pulp_supply,
+        "fuel_supply": fuel_supply,
+        "timber_supply": timber_supply,
+        "total_shares": col("lumbershare") + col("papershare") + col("fuelshare"),
+        "total_enduse": total_enduse,
+    }
+
+
+def compute_flows_for(data):
+    """Single-scenario convenience wrapper: dict in, {flow name: float} out."""
+    flows = compute_flows(scenario_matrix([data]))
+    return {name: float(values[0]) for name, values in flows.items()}
@@ -1,25 +1,48 @@
-import sqlite3
+"""
+Creates users.db and provisions survey respondents.
+
+Bulk import from a CSV with `email` and `password` columns:
+    python init_user_db.py invited.csv
+Users are inserted in one transaction and each user gets a default
+responses row in data.db, so the first login does not have to create it.
+Existing users are left unchanged. Rows with an empty password are skipped
+and counted, as they would otherwise get the hash of "".
+"""
+import argparse
+import csv
 import hashlib
+import itertools
+import sqlite3
+
+import db
+import migrate
+import schema
 
 DB_FILE = "users.db"  # new database file
+DATA_DB_FILE = "data.db"
+
+# Rivejä kerrallaan muistissa tuonnin aikana
+BATCH_SIZE = 5000
+
+USERS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT UNIQUE,
+        password_hash TEXT
+    )
+"""
 
 # ---------------------------
 # Helper functions
 # ---------------------------
 
-def create_users_table():
-    conn = sqlite3.connect(DB_FILE)
+def create_users_table(path=DB_FILE):
+    conn = sqlite3.connect(path)
     c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE,
-            password_hash TEXT
-        )
-    """)
+    c.execute(USERS_TABLE_SQL)
     conn.commit()
     conn.close()
-    print(f"Users table created in {DB_FILE}.")
+    print(f"Users table created in {path}.")
 
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
@@ -37,22 +60,74 @@ def add_user(email, password):
     finally:
         conn.close()
 
+def read_users(csv_path):
+    """Streams (email, password) pairs from the CSV, skipping rows without an email."""
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            email = (row.get("email") or "").strip()
+            if email:
+                yield email, row.get("password") or ""
+
+
+def import_users(csv_path, users_db=DB_FILE, data_db=DATA_DB_FILE):
+    """
+    Bulk-inserts the CSV's users and their default responses rows, skipping
+    rows with an empty password. Returns (read, added, skipped).
+    """
+    migrate.migrate(data_db)
+
+    users_conn = db.connect(users_db)
+    users_conn.execute(USERS_TABLE_SQL)
+    data_conn = db.connect(data_db)
+    read = 0
+    added = 0
+    skipped = 0
+    try:
+        with users_conn, data_conn:
+            rows = read_users(csv_path)
+            while True:
+                batch = list(itertools.islice(rows, BATCH_SIZE))
+                if not batch:
+                    break
+                read += len(batch)
+                # Tyhjä salasana ei kelpaa: sha256("") olisi kenen tahansa arvattavissa
+                with_password = [(email, password) for email, password in batch if password]
+                skipped += len(batch) - len(with_password)
+                batch = with_password
+                emails = [email for email, _ in batch]
+                # sha256 on mikrosekuntien työ; prosessipooli maksaisi enemmän kuin säästää
+                hashes = [hash_password(password) for _, password in batch]
+
+                before = users_conn.total_changes
+                users_conn.executemany(
+                    "INSERT OR IGNORE INTO users (email, password_hash) VALUES (?, ?)",
+                    zip(emails, hashes),
+                )
+                added += users_conn.total_changes - before
+
+                data_conn.executemany(
+                    schema.INSERT_DEFAULT_ROW_SQL, (schema.default_row(email) for email in emails)
+                )
+    finally:
+        users_conn.close()
+        data_conn.close()
+    return read, added, skipped
+
+
 # ---------------------------
 # Run initialization
 # ---------------------------
 
 if __name__ == "__main__":
-    create_users_table()
-
-    # Add users here (run once)
-    add_user("alice@example.com", "password123")
-    add_user("bob@example.com", "securepass")
-    add_user("attekosk@gmail.com", "passu")
-    add_user("atte.koskivaara@luke.fi", "security")
-    add_user("aliisa.koivisto@gmail.com", "HildaHelvi")
-    add_user("katja.lahtinen@luke.fi", "umass2025")
-    add_user("vision2060@umass.edu", "vision2060")
-    add_user("clouston@umass.edu", "mountsugarloaf")
-    add_user("tuula.packalen@luke.fi", "luke2025")
+    parser = argparse.ArgumentParser(description="Create users.db and import survey users from a CSV.")
+    parser.add_argument("csv", nargs="?", help="CSV with email and password columns")
+    parser.add_argument("--users-db", default=DB_FILE)
+    parser.add_argument("--data-db", default=DATA_DB_FILE)
+    args = parser.parse_args()
 
+    create_users_table(args.users_db)
 
+    if args.csv:
+        read, added, skipped = import_users(args.csv, args.users_db, args.data_db)
+        print(f"{read} users read, {added} added, {read - added - skipped} already existed, "
+              f"{skipped} skipped for an empty password.")
@@ -0,0 +1,312 @@
+"""
+Versioned schema migrations for data.db.
+
+Applied migrations are recorded in the schema_version table. Pending steps
+run in order inside one BEGIN IMMEDIATE transaction, so a failed step leaves
+the database as it was, and two workers starting at the same time cannot
+both apply a step. The app calls migrate() at startup. When nothing is
+pending it only reads schema_version and takes no write lock. Adding a
+column (a schema change only) or an index over the few thousand responses
+holds the lock for milliseconds.
+
+Adding a column: add it to schema.COLUMNS and append a step
+    (N, "add <name>", add_columns("<name> <SQL type>"))
+to MIGRATIONS. Never renumber or edit a step that has already shipped. Steps
+spell out their DDL, column lists and queries literally instead of reading
+schema or other modules, so a later change there cannot alter what an old
+step does to a database that has not run it yet.
+
+Run by hand:
+    python migrate.py
+"""
+import os
+import sqlite3
+
+import db
+
+
+def add_columns(*columns):
+    """Migration step adding columns ("<name> <SQL type>") that responses does not have yet."""
+    def step(conn):
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(responses)")}
+        for ddl in columns:
+            if ddl.split()[0] not in existing:
+                conn.execute(f"ALTER TABLE responses ADD COLUMN {ddl}")
+    return step
+
+
+def _create_responses(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS responses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            email TEXT UNIQUE,
+            state_checklist TEXT,
+            state_other TEXT,
+            organization_size TEXT,
+            organization_type TEXT,
+            organization_type_other TEXT,
+            general_comment TEXT,
+            prof_position TEXT,
+            prof_position_other TEXT,
+            years_experience INTEGER,
+            protWoodlands REAL,
+            unprotectedForest REAL,
+            wildlands REAL,
+            farmland REAL,
+            developed REAL,
+            waterAndWetlands REAL,
+            lumbershare REAL,
+            papershare REAL,
+            from_lumber_to_pulp REAL,
+            fuelshare REAL,
+            import_lumber REAL,
+            import_paper REAL,
+            construction_multistory_val REAL,
+            construction_single_val REAL,
+            manufacturing_val REAL,
+            packaging_val REAL,
+            other_val REAL,
+            other_construction_val REAL,
+            non_res_construction_val REAL,
+            recovery_timber REAL,
+            logging_intensity REAL,
+            regional_economy INTEGER,
+            local_owners INTEGER,
+            carbon_substitution INTEGER,
+            carbon_storage INTEGER,
+            biodiversity INTEGER,
+            local_sourcing INTEGER,
+            employment_conditions INTEGER,
+            training_development INTEGER,
+            community_engagement INTEGER,
+            regional_economy_cannot_answer INTEGER,
+            local_owners_cannot_answer INTEGER,
+            carbon_substitution_cannot_answer INTEGER,
+            carbon_storage_cannot_answer INTEGER,
+            biodiversity_cannot_answer INTEGER,
+            local_sourcing_cannot_answer INTEGER,
+            employment_conditions_cannot_answer INTEGER,
+            training_development_cannot_answer INTEGER,
+            community_engagement_cannot_answer INTEGER,
+            logins INTEGER DEFAULT 0,
+            reset_btn_1 INTEGER DEFAULT 0,
+            reset_btn_2 INTEGER DEFAULT 0,
+            logout_without_responding INTEGER DEFAULT 0,
+            submit_count INTEGER DEFAULT 0,
+            failed_attempts_landcover INTEGER DEFAULT 0,
+            failed_attempts_share INTEGER DEFAULT 0,
+            failed_attempts_supply INTEGER DEFAULT 0,
+            elapsed_time_seconds INTEGER DEFAULT 0
+        )
+    """)
+
+
+def _index_submitted(conn):
+    # Analyysit ja vienti lukevat vain lähetetyt vastaukset
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_responses_submitted
+        ON responses (email) WHERE submit_count > 0
+    """)
+
+
+def _create_events(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY,
+            email TEXT NOT NULL,
+            event TEXT NOT NULL,
+            ts REAL NOT NULL,
+            amount INTEGER NOT NULL DEFAULT 1,
+            payload TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_events_email_event ON events (email, event)")
+
+    # Nykyiset laskurit alkusaldoksi, jotta tapahtumista johdetut summat täsmäävät
+    for column in (
+        "logins", "reset_btn_1", "reset_btn_2", "logout_without_responding", "submit_count",
+        "failed_attempts_landcover", "failed_attempts_share", "failed_attempts_supply",
+        "elapsed_time_seconds",
+    ):
+        conn.execute(f"""
+            INSERT INTO events (email, event, ts, amount, payload)
+            SELECT email, '{column}', CAST(strftime('%s', 'now') AS REAL), {column}, '{{"backfill": true}}'
+            FROM responses WHERE {column} > 0
+        """)
+
+
+# Askeleen 5 kentät: (kenttä, lokeron leveys, "ei osaa sanoa" -sarake)
+_AGGREGATE_FIELDS = (
+    [(name, 1, None) for name in (
+        "protWoodlands", "unprotectedForest", "wildlands", "farmland", "developed", "waterAndWetlands",
+        "lumbershare", "papershare", "fuelshare",
+    )]
+    + [("logging_intensity", 0.5, None)]
+    + [(name, 1000, None) for name in (
+        "construction_multistory_val", "construction_single_val", "manufacturing_val", "packaging_val",
+        "other_val", "other_construction_val", "non_res_construction_val",
+    )]
+    + [(name, 1, f"{name}_cannot_answer") for name in (
+        "regional_economy", "local_owners", "carbon_substitution", "carbon_storage", "biodiversity",
+        "local_sourcing", "employment_conditions", "training_development", "community_engagement",
+    )]
+)
+
+
+def _create_aggregates(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS aggregate_stats (
+            field TEXT PRIMARY KEY,
+            n INTEGER NOT NULL,
+            total REAL NOT NULL,
+            total_sq REAL NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS aggregate_hist (
+            field TEXT NOT NULL,
+            bin INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (field, bin)
+        )
+    """)
+
+    # Lähetetyt vastaukset tauluihin kuten aggregates.rebuild() sen julkaisuhetkellä;
+    # lokero = floor(v / w + 0.5), "ei osaa sanoa" -vastaukset jätetään pois
+    conn.execute("DELETE FROM aggregate_stats")
+    conn.execute("DELETE FROM aggregate_hist")
+    for name, width, cannot_answer in _AGGREGATE_FIELDS:
+        answered = f"""
+            FROM responses WHERE submit_count > 0 AND typeof({name}) IN ('integer', 'real')
+            {f"AND NOT COALESCE({cannot_answer}, 0)" if cannot_answer else ""}
+        """
+        conn.execute(f"""
+            INSERT INTO aggregate_stats (field, n, total, total_sq)
+            SELECT '{name}', COUNT(*), SUM({name}), SUM({name} * {name}) {answered}
+            HAVING COUNT(*) > 0
+        """)
+        x = f"({name} / {float(width)} + 0.5)"
+        conn.execute(f"""
+            INSERT INTO aggregate_hist (field, bin, count)
+            SELECT '{name}', CAST({x} AS INTEGER) - ({x} < CAST({x} AS INTEGER)) AS bin, COUNT(*) {answered}
+            GROUP BY bin
+        """)
+
+
+def _index_events_by_type(conn):
+    # Uusin lähetys (consensus.submissions_signature) yhdellä indeksihaulla
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_events_event ON events (event, id)")
+
+
+def _create_clusters(conn):
+    # Taulut täyttää yöllinen `python clusters.py`
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS scenario_clusters (
+            email TEXT PRIMARY KEY,
+            cluster INTEGER NOT NULL,
+            distance REAL NOT NULL,
+            run_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cluster_centroids (
+            cluster INTEGER NOT NULL,
+            field TEXT NOT NULL,
+            value REAL NOT NULL,
+            size INTEGER NOT NULL,
+            run_at TEXT NOT NULL,
+            PRIMARY KEY (cluster, field)
+        )
+    """)
+
+
+# (versio, kuvaus, askel); järjestys = ajojärjestys
+MIGRATIONS = [
+    (1, "create responses", _create_responses),
+    # Korvaa alter_db.py:n: rekisterin sarakkeet sellaisina kuin ne olivat tämän askeleen julkaisussa
+    (2, "add missing registry columns", add_columns(
+        "state_checklist TEXT", "state_other TEXT", "organization_size TEXT", "organization_type TEXT",
+        "organization_type_other TEXT", "general_comment TEXT", "prof_position TEXT",
+        "prof_position_other TEXT", "years_experience INTEGER",
+        "protWoodlands REAL", "unprotectedForest REAL", "wildlands REAL", "farmland REAL", "developed REAL",
+        "waterAndWetlands REAL", "lumbershare REAL", "papershare REAL", "from_lumber_to_pulp REAL",
+        "fuelshare REAL", "import_lumber REAL", "import_paper REAL", "construction_multistory_val REAL",
+        "construction_single_val REAL", "manufacturing_val REAL", "packaging_val REAL", "other_val REAL",
+        "other_construction_val REAL", "non_res_construction_val REAL", "recovery_timber REAL",
+        "logging_intensity REAL",
+        "regional_economy INTEGER", "local_owners INTEGER", "carbon_substitution INTEGER",
+        "carbon_storage INTEGER", "biodiversity INTEGER", "local_sourcing INTEGER",
+        "employment_conditions INTEGER", "training_development INTEGER", "community_engagement INTEGER",
+        "regional_economy_cannot_answer INTEGER", "local_owners_cannot_answer INTEGER",
+        "carbon_substitution_cannot_answer INTEGER", "carbon_storage_cannot_answer INTEGER",
+        "biodiversity_cannot_answer INTEGER", "local_sourcing_cannot_answer INTEGER",
+        "employment_conditions_cannot_answer INTEGER", "training_development_cannot_answer INTEGER",
+        "community_engagement_cannot_answer INTEGER",
+        "logins INTEGER DEFAULT 0", "reset_btn_1 INTEGER DEFAULT 0", "reset_btn_2 INTEGER DEFAULT 0",
+        "logout_without_responding INTEGER DEFAULT 0", "submit_count INTEGER DEFAULT 0",
+        "failed_attempts_landcover INTEGER DEFAULT 0", "failed_attempts_share INTEGER DEFAULT 0",
+        "failed_attempts_supply INTEGER DEFAULT 0", "elapsed_time_seconds INTEGER DEFAULT 0",
+    )),
+    (3, "index submitted responses", _index_submitted),
+    (4, "create events log", _create_events),
+    (5, "create results aggregates", _create_aggregates),
+    (6, "index events by type", _index_events_by_type),
+    (7, "create scenario clusters", _create_clusters),
+]
+
+
+def current_version(conn):
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0  # taulua ei vielä ole
+    return row[0] or 0
+
+
+def migrate(path):
+    """Applies pending migrations to the database at `path`; returns the resulting version."""
+    conn = db.connect(path)
+    conn.isolation_level = None  # transaktio hallitaan itse
+    try:
+        latest = MIGRATIONS[-1][0]
+        if current_version(conn) >= latest:
+            return latest
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT,
+                    applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            # Luetaan uudelleen lukon alla: toinen työprosessi on voinut ehtiä ensin
+            version = current_version(conn)
+            for number, description, step in MIGRATIONS:
+                if number > version:
+                    print(f"Applying migration {number}: {description}")
+                    step(conn)
+                    conn.execute(
+                        "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                        (number, description),
+                    )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return latest
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    ENV = os.getenv("FLASK_ENV", "development")  # oletus development
+
+    if ENV == "production":
+        DATA_DB_FILE = "/home/hulicupter/flask_app/NEforestry/data.db"
+    else:
+        DATA_DB_FILE = "data.db"
+
+    print(f"data.db at schema version {migrate(DATA_DB_FILE)}")
@@ -1,13 +1,19 @@
-import sqlite3
-
-conn = sqlite3.connect("data.db")
-cursor = conn.cursor()
-
-# Empty a single table
-cursor.execute("DELETE FROM responses")
-
-# Reset auto-increment
-cursor.execute("DELETE FROM sqlite_sequence WHERE name='responses'")
-
-conn.commit()
-conn.close()
+import sqlite3
+
+import migrate
+
+# Kaikki taulut olemassa, vaikka kantaa ei olisi vielä migratoitu
+migrate.migrate("data.db")
+
+conn = sqlite3.connect("data.db")
+cursor = conn.cursor()
+
+# Empty the responses and everything derived from them, in one transaction
+for table in ("responses", "events", "aggregate_stats", "aggregate_hist", "scenario_clusters", "cluster_centroids"):
+    cursor.execute(f"DELETE FROM {table}")
+
+# Reset auto-increment
+cursor.execute("DELETE FROM sqlite_sequence WHERE name='responses'")
+
+conn.commit()
+conn.close()
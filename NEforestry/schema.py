@@ -0,0 +1,144 @@
+"""
+Column registry for the responses table in data.db.
+
+Every column of `responses` is listed once here with its SQL type, the value
+a new respondent row starts with and whether the survey form saves it. The
+DDL (init_db.py), the default-row insert, the submit upsert and the form
+mapping are generated from this list when the module is imported, so the
+app and the scripts cannot drift apart and no SQL is assembled per request.
+"""
+from collections import namedtuple
+
+import flow_model
+
+# name: sarakkeen nimi, sql: tyyppi DDL:ssä, default: uuden rivin arvo,
+# form: tallennetaanko kyselylomakkeelta, json: monivalinta (JSON-lista),
+# empty: lomakkeen arvo, kun kannassa on NULL
+Column = namedtuple("Column", ["name", "sql", "default", "form", "json", "empty"])
+
+
+def _column(name, sql, default=None, form=False, json=False, empty=None):
+    return Column(name, sql, default, form, json, empty)
+
+
+def _model_input(name):
+    return _column(name, "REAL", default=flow_model.DEFAULTS.get(name, 0), form=True)
+
+
+LIKERT_IDS = (
+    "regional_economy",
+    "local_owners",
+    "carbon_substitution",
+    "carbon_storage",
+    "biodiversity",
+    "local_sourcing",
+    "employment_conditions",
+    "training_development",
+    "community_engagement",
+)
+
+# Johdetaan events-taulusta (telemetry.materialize_counters)
+COUNTER_COLUMNS = (
+    "logins",
+    "reset_btn_1",
+    "reset_btn_2",
+    "logout_without_responding",
+    "submit_count",
+    "failed_attempts_landcover",
+    "failed_attempts_share",
+    "failed_attempts_supply",
+    "elapsed_time_seconds",
+)
+
+COLUMNS = (
+    (
+        _column("email", "TEXT UNIQUE"),
+
+        # Taustatiedot
+        _column("state_checklist", "TEXT", form=True, json=True),
+        _column("state_other", "TEXT", default="", form=True),
+        _column("organization_size", "TEXT", default="", form=True),
+        _column("organization_type", "TEXT", form=True, json=True),
+        _column("organization_type_other", "TEXT", default="", form=True),
+        _column("general_comment", "TEXT", default="", form=True, empty=""),
+        _column("prof_position", "TEXT", form=True, json=True),
+        _column("prof_position_other", "TEXT", default="", form=True),
+        _column("years_experience", "INTEGER", form=True),
+    )
+    # Maankäyttö ja virtamallin syötteet
+    + tuple(_model_input(name) for name in (
+        "protWoodlands",
+        "unprotectedForest",
+        "wildlands",
+        "farmland",
+        "developed",
+        "waterAndWetlands",
+        "lumbershare",
+        "papershare",
+        "from_lumber_to_pulp",
+        "fuelshare",
+        "import_lumber",
+        "import_paper",
+    ) + flow_model.END_USES + (
+        "recovery_timber",
+        "logging_intensity",
+    ))
+    # Likert-kysymykset
+    + tuple(_column(q, "INTEGER", default=3, form=True) for q in LIKERT_IDS)
+    + tuple(_column(f"{q}_cannot_answer", "INTEGER", default=0, form=True, empty=0) for q in LIKERT_IDS)
+    + tuple(_column(name, "INTEGER DEFAULT 0", default=0) for name in COUNTER_COLUMNS)
+)
+
+COLUMN_NAMES = tuple(column.name for column in COLUMNS)
+BY_NAME = {column.name: column for column in COLUMNS}
+
+FORM_COLUMNS = tuple(column for column in COLUMNS if column.form)
+JSON_COLUMNS = tuple(column.name for column in COLUMNS if column.json)
+
+# Kyselyn tallentamat sarakkeet
+SUBMIT_COLUMNS = ("email",) + tuple(column.name for column in FORM_COLUMNS)
+
+
+def column_ddl(column):
+    return f"{column.name} {column.sql}"
+
+
+CREATE_TABLE_SQL = (
+    "CREATE TABLE IF NOT EXISTS responses (\n"
+    "    id INTEGER PRIMARY KEY AUTOINCREMENT,\n"
+    "    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,\n"
+    + ",\n".join(f"    {column_ddl(column)}" for column in COLUMNS)
+    + "\n)"
+)
+
+# Uuden vastaajan rivi; olemassa olevaan riviin ei kosketa
+INSERT_DEFAULT_ROW_SQL = (
+    f"INSERT OR IGNORE INTO responses ({', '.join(COLUMN_NAMES)}) "
+    f"VALUES ({', '.join(['?'] * len(COLUMN_NAMES))})"
+)
+
+UPSERT_SQL = (
+    f"INSERT INTO responses ({', '.join(SUBMIT_COLUMNS)}) "
+    f"VALUES ({', '.join(['?'] * len(SUBMIT_COLUMNS))}) "
+    "ON CONFLICT(email) DO UPDATE SET "
+    + ", ".join(f"{name}=excluded.{name}" for name in SUBMIT_COLUMNS if name != "email")
+)
+
+
+def default_row(email):
+    """Values for INSERT_DEFAULT_ROW_SQL."""
+    return [email if column.name == "email" else column.default for column in COLUMNS]
+
+
+def form_values(row):
+    """Maps a decoded responses row (dict or None) to the survey form's field values."""
+    row = row or {}
+    values = {}
+    for column in FORM_COLUMNS:
+        value = row.get(column.name)
+        if column.json:
+            value = value if isinstance(value, list) else []
+        elif value is None:
+            value = column.empty
+        values[column.name] = value
+    return values
@@ -0,0 +1,129 @@
+"""
+Consistent snapshot of the responses table for analysis.
+
+Copies data.db with SQLite's online backup API (the live survey keeps
+writing meanwhile; the copy is one consistent state) and writes the
+responses table from the copy to a compressed Parquet file. Column dtypes
+follow schema.COLUMNS. The counters are summed from the events log, as the
+counter columns are only refreshed at submit and logout. The multi-choice
+JSON columns are decoded to lists and also one-hot encoded as
+`<column>__<choice>` boolean columns.
+
+    python snapshot.py [--db data.db] [--out snapshots/] [--keep-db]
+
+Parquet output needs pyarrow (in requirements.txt; the survey app itself
+does not import it).
+"""
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+
+import pandas as pd
+
+import schema
+import telemetry
+
+# Koko kanta yhdellä askeleella: WAL-tilassa lukija ei estä kirjoittajia, ja
+# pienissä paloissa kopio alkaisi alusta jokaisen samanaikaisen kirjoituksen jälkeen
+BACKUP_PAGES = -1
+
+_DTYPES = {"REAL": "float64", "INTEGER": "Int64", "TEXT": "string"}
+
+# INTEGER-sarakkeet, joihin vapaa numerokenttä voi tallentaa desimaaleja (SQLite säilyttää ne REAL-arvoina)
+_FLOAT_COLUMNS = {"years_experience"}
+
+
+def backup(db_path, target=":memory:"):
+    """Returns a connection to a consistent copy of `db_path` (in memory by default)."""
+    src = sqlite3.connect(db_path)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst, pages=BACKUP_PAGES)
+    finally:
+        src.close()
+    return dst
+
+
+def _decode_list(value):
+    if not isinstance(value, str) or not value:
+        return []
+    try:
+        decoded = json.loads(value)
+    except ValueError:
+        return []
+    return decoded if isinstance(decoded, list) else []
+
+
+def responses_frame(conn):
+    """The responses table as a typed DataFrame, JSON list columns decoded and one-hot encoded."""
+    df = pd.read_sql_query(telemetry.responses_query(conn), conn)
+    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+
+    for column in schema.COLUMNS:
+        if column.name not in df or column.json:
+            continue
+        sql_type = column.sql.split()[0]
+        if column.name in _FLOAT_COLUMNS:
+            sql_type = "REAL"
+        if sql_type in ("REAL", "INTEGER"):
+            df[column.name] = pd.to_numeric(df[column.name], errors="coerce")
+        if sql_type == "INTEGER":
+            # Yksikin desimaaliarvo kaataisi Int64-muunnoksen
+            df[column.name] = df[column.name].round()
+        df[column.name] = df[column.name].astype(_DTYPES[sql_type])
+
+    one_hot = []
+    for name in schema.JSON_COLUMNS:
+        if name not in df:
+            continue
+        lists = df[name].map(_decode_list)
+        df[name] = lists
+        choices = sorted({str(choice) for values in lists for choice in values})
+        one_hot.append(pd.DataFrame(
+            {f"{name}__{choice}": lists.map(lambda values, c=choice: c in map(str, values)) for choice in choices},
+            index=df.index,
+        ))
+
+    return pd.concat([df] + one_hot, axis=1)
+
+
+def write_snapshot(db_path, out_dir, keep_db=False):
+    """Writes responses-<time>.parquet (and optionally the .db copy) to `out_dir`; returns the path."""
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    base = os.path.join(out_dir, f"responses-{stamp}")
+
+    conn = backup(db_path, base + ".db" if keep_db else ":memory:")
+    try:
+        df = responses_frame(conn)
+    finally:
+        conn.close()
+
+    # Valmis tiedosto ilmestyy kerralla; keskeneräistä ei lueta
+    tmp_path = base + ".parquet.tmp"
+    try:
+        df.to_parquet(tmp_path, engine="pyarrow", compression="zstd", index=False)
+    except ImportError as e:
+        raise SystemExit(f"{e}\nParquet snapshots need pyarrow: pip install pyarrow")
+    os.replace(tmp_path, base + ".parquet")
+    return base + ".parquet"
+
+
+if __name__ == "__main__":
+    ENV = os.getenv("FLASK_ENV", "development")  # oletus development
+
+    if ENV == "production":
+        DATA_DB_FILE = "/home/hulicupter/flask_app/NEforestry/data.db"
+    else:
+        DATA_DB_FILE = "data.db"
+
+    parser = argparse.ArgumentParser(description="Snapshot the responses table to Parquet.")
+    parser.add_argument("--db", default=DATA_DB_FILE)
+    parser.add_argument("--out", default="snapshots")
+    parser.add_argument("--keep-db", action="store_true", help="also keep the consistent .db copy")
+    args = parser.parse_args()
+
+    path = write_snapshot(args.db, args.out, args.keep_db)
+    print(f"Snapshot written to {path}")
@@ -0,0 +1,215 @@
+"""
+Interaction events: logins, resets, failed submit attempts, active time.
+
+Each interaction is appended to the narrow `events` table (email, event,
+ts, amount, payload) instead of rewriting the wide responses row. Events
+are buffered in memory and inserted in one batch every FLUSH_SECONDS and
+when the process exits; a hard kill can lose at most the last interval's
+events, which is acceptable for usage statistics. Active-time heartbeats
+are merged per respondent in the buffer, so they cost one row per flush.
+
+The counter columns of responses (logins, reset_btn_1, ...) are derived
+from the events: materialize_counters() rewrites them for given emails,
+which the app does at submit and logout. Readers that need current
+counts for everyone (export, snapshot) select through responses_query().
+Event names are the counter column names.
+
+The flush normally runs on a background thread (start()). If the server
+does not run threads (e.g. uWSGI without enable-threads), add() flushes
+inline once the buffer is clearly overdue, so events are still written.
+
+Rewrite every respondent's counters from the event log:
+    python telemetry.py
+"""
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import db
+import schema
+
+# Sallitut tapahtumat = responses-taulun laskurisarakkeet; nimet liitetään SQL:ään
+COUNTER_COLUMNS = schema.COUNTER_COLUMNS
+
+# Nämä yhdistetään puskurissa yhdeksi riviksi vastaajaa kohden
+MERGED_EVENTS = frozenset({"elapsed_time_seconds"})
+
+FLUSH_SECONDS = float(os.getenv("COUNTER_FLUSH_SECONDS", "15"))
+
+INSERT_EVENTS_SQL = "INSERT INTO events (email, event, ts, amount, payload) VALUES (?, ?, ?, ?, ?)"
+
+# Jokainen laskuri lasketaan tapahtumista (indeksi idx_events_email_event)
+COUNTER_TOTAL_SQL = (
+    "(SELECT COALESCE(SUM(amount), 0) FROM events"
+    " WHERE events.email = responses.email AND events.event = '{}')"
+)
+
+MATERIALIZE_SQL = "UPDATE responses SET " + ", ".join(
+    f"{c} = {COUNTER_TOTAL_SQL.format(c)}" for c in COUNTER_COLUMNS
+)
+
+
+def event(email, name, amount=1, payload=None):
+    """One event row for INSERT_EVENTS_SQL; `payload` is any JSON-serializable value."""
+    return [email, name, time.time(), amount, json.dumps(payload) if payload is not None else None]
+
+
+class CounterBuffer:
+    """Interaction events waiting to be appended to the events table in `db_path`."""
+
+    def __init__(self, db_path, columns=COUNTER_COLUMNS, flush_seconds=FLUSH_SECONDS, on_write=None):
+        self.db_path = db_path
+        self.columns = frozenset(columns)
+        self.flush_seconds = flush_seconds
+        # Kutsutaan niiden sähköpostien kanssa, joiden tietoja kirjoitettiin
+        self.on_write = on_write
+        self._pending = []  # event()-rivit saapumisjärjestyksessä
+        self._merged = {}  # (email, tapahtuma) -> puskurissa oleva rivi
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def add(self, email, column, amount=1, payload=None):
+        if column not in self.columns:
+            raise ValueError(f"Unknown counter column: {column}")
+        if not email:
+            return
+
+        row = event(email, column, amount, payload)
+        with self._lock:
+            merged = self._merged.get((email, column)) if column in MERGED_EVENTS else None
+            if merged is not None:
+                merged[2] = row[2]
+                merged[3] += amount
+            else:
+                self._pending.append(row)
+                if column in MERGED_EVENTS:
+                    self._merged[(email, column)] = row
+            overdue = time.monotonic() - self._last_flush > 2 * self.flush_seconds
+
+        if overdue:
+            self.flush()
+
+    def take(self, email=None):
+        """Removes and returns the pending event rows (all, or one email's)."""
+        with self._lock:
+            if email is None:
+                pending, self._pending = self._pending, []
+                self._merged = {}
+            else:
+                pending = [row for row in self._pending if row[0] == email]
+                self._pending = [row for row in self._pending if row[0] != email]
+                self._merged = {key: row for key, row in self._merged.items() if key[0] != email}
+        return pending
+
+    def restore(self, pending):
+        """Puts rows returned by take() back, e.g. after a failed write."""
+        with self._lock:
+            self._pending = pending + self._pending
+
+    def flush(self, email=None):
+        """Appends the pending events (all, or one email's) in one transaction."""
+        pending = self.take(email)
+        if email is None:
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        try:
+            conn = db.get_connection(self.db_path)
+            with conn:
+                conn.executemany(INSERT_EVENTS_SQL, pending)
+        except sqlite3.Error:
+            self.restore(pending)
+            raise
+
+        if self.on_write is not None:
+            self.on_write({row[0] for row in pending})
+        return len(pending)
+
+    def materialize(self, email):
+        """Flushes the email's events and rewrites its responses counters from the log."""
+        pending = self.take(email)
+        try:
+            conn = db.get_connection(self.db_path)
+            with conn:
+                conn.executemany(INSERT_EVENTS_SQL, pending)
+                materialize_counters(conn, [email])
+        except sqlite3.Error:
+            self.restore(pending)
+            raise
+
+        if self.on_write is not None:
+            self.on_write([email])
+
+    def start(self):
+        """Starts the periodic flush thread and the flush at interpreter exit."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="counter-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"Event flush failed, retrying later: {e}")
+
+
+def materialize_counters(conn, emails=None):
+    """
+    Rewrites the counter columns of responses from the events table, for
+    `emails` or for every respondent. The caller owns the transaction.
+    """
+    if emails is None:
+        conn.execute(MATERIALIZE_SQL)
+    else:
+        conn.executemany(MATERIALIZE_SQL + " WHERE email = ?", [(email,) for email in emails])
+
+
+def responses_query(conn):
+    """
+    "SELECT <every responses column> FROM responses" with the counter columns
+    summed from the events table. responses only holds counters as of the
+    respondent's last submit or logout; readers use this to see current ones.
+    """
+    names = [row[1] for row in conn.execute("PRAGMA table_info(responses)")]
+    return "SELECT " + ", ".join(
+        f"{COUNTER_TOTAL_SQL.format(name)} AS {name}" if name in COUNTER_COLUMNS else name
+        for name in names
+    ) + " FROM responses"
+
+
+def counter_totals(conn, email):
+    """{counter: total} for one respondent, straight from the events table."""
+    rows = conn.execute(
+        "SELECT event, SUM(amount) FROM events WHERE email = ? GROUP BY event", (email,)
+    ).fetchall()
+    totals = dict.fromkeys(COUNTER_COLUMNS, 0)
+    totals.update(rows)
+    return totals
+
+
+if __name__ == "__main__":
+    ENV = os.getenv("FLASK_ENV", "development")  # oletus development
+
+    if ENV == "production":
+        DATA_DB_FILE = "/home/hulicupter/flask_app/NEforestry/data.db"
+    else:
+        DATA_DB_FILE = "data.db"
+
+    conn = db.connect(DATA_DB_FILE)
+    with conn:
+        materialize_counters(conn)
+    conn.close()
+    print("Counters rewritten from the event log.")
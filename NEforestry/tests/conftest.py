@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+# Moduulit tuodaan suoraan (import db), kuten app.py:ssä
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def baseline():
+    """The 2020 inputs (app.py DEFAULTS) as one scenario dict."""
+    return {
+        "logging_intensity": 27,
+        "protWoodlands": 21,
+        "unprotectedForest": 57,
+        "lumbershare": 40,
+        "papershare": 40,
+        "fuelshare": 20,
+        "import_lumber": 150000,
+        "import_paper": 115000,
+        "recovery_timber": 8000,
+        "construction_multistory_val": 19100,
+        "construction_single_val": 99400,
+        "manufacturing_val": 45900,
+        "packaging_val": 49700,
+        "other_val": 34400,
+        "other_construction_val": 107100,
+        "non_res_construction_val": 26800,
+    }
+
+
+@pytest.fixture
+def data_db(tmp_path):
+    """Path of a migrated, empty data.db."""
+    import migrate
+
+    path = str(tmp_path / "data.db")
+    migrate.migrate(path)
+    return path
@@ -0,0 +1,48 @@
+import sqlite3
+
+import pytest
+
+import aggregates
+import schema
+import telemetry
+
+
+def submit(conn, email, **answers):
+    """Writes a submission the way save_responses_to_db does and updates the aggregates."""
+    conn.execute(schema.INSERT_DEFAULT_ROW_SQL, schema.default_row(email))
+    previous = aggregates.old_submission(conn, email)
+    row = dict(zip(schema.COLUMN_NAMES, schema.default_row(email)), **answers)
+    conn.execute(schema.UPSERT_SQL, [row.get(name) for name in schema.SUBMIT_COLUMNS])
+    conn.execute(telemetry.INSERT_EVENTS_SQL, telemetry.event(email, "submit_count"))
+    telemetry.materialize_counters(conn, [email])
+    aggregates.update_for_submit(conn, previous, row)
+
+
+def test_resubmission_replaces_previous_answers(data_db):
+    conn = sqlite3.connect(data_db)
+    submit(conn, "a@example.com", wildlands=10, regional_economy=5)
+    submit(conn, "b@example.com", wildlands=20, regional_economy=1)
+    submit(conn, "a@example.com", wildlands=30, regional_economy=4, regional_economy_cannot_answer=1)
+    incremental = aggregates.summary(conn)
+
+    aggregates.rebuild(conn)
+    rebuilt = aggregates.summary(conn)
+    conn.close()
+
+    assert incremental == rebuilt
+    assert incremental["wildlands"]["n"] == 2
+    assert incremental["wildlands"]["mean"] == pytest.approx(25)
+    # "cannot answer" jätetään pois
+    assert incremental["regional_economy"]["n"] == 1
+    assert incremental["regional_economy"]["mean"] == pytest.approx(1)
+
+
+def test_median_is_interpolated_within_bin(data_db):
+    conn = sqlite3.connect(data_db)
+    for i, value in enumerate([1, 2, 3, 4, 5]):
+        submit(conn, f"u{i}@example.com", farmland=value)
+    result = aggregates.summary(conn)["farmland"]
+    conn.close()
+
+    assert result["median"] == pytest.approx(3)
+    assert result["counts"] == [1, 1, 1, 1, 1]
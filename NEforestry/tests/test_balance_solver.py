@@ -0,0 +1,36 @@
+import pytest
+
+import balance_solver
+import flow_model
+
+
+@pytest.mark.parametrize("changes", [
+    {},
+    {"import_lumber": 0},
+    {"import_lumber": 500000},
+    {"construction_single_val": 200000},
+])
+def test_auto_balance_is_feasible(baseline, changes):
+    data = dict(baseline, **changes)
+    result = balance_solver.auto_balance(data)
+    assert result["balanced"]
+    lo, hi, _ = flow_model.INPUT_BOUNDS["import_lumber"]
+    assert lo <= result["import_lumber"] <= hi
+    lo, hi, _ = flow_model.INPUT_BOUNDS["logging_intensity"]
+    assert lo <= result["logging_intensity"] <= hi
+
+    data.update(import_lumber=result["import_lumber"], logging_intensity=result["logging_intensity"])
+    flows = flow_model.compute_flows_for(data)
+    assert abs(flows["total_enduse"] - flows["lumber_supply"]) <= flow_model.BALANCE_TOLERANCE
+
+
+def test_auto_balance_reports_infeasible_demand(baseline):
+    result = balance_solver.auto_balance(dict(baseline, **{name: 10_000_000 for name in flow_model.END_USES}))
+    assert not result["balanced"]
+
+
+def test_auto_balance_defaults_missing_intensity(baseline):
+    result = balance_solver.auto_balance(dict(baseline, logging_intensity=None))
+    lo, hi, step = flow_model.INPUT_BOUNDS["logging_intensity"]
+    assert lo <= result["logging_intensity"] <= hi
+    assert result["logging_intensity"] == pytest.approx(round(result["logging_intensity"] / step) * step)
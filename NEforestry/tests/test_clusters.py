@@ -0,0 +1,54 @@
+import sqlite3
+
+import numpy as np
+
+import clusters
+
+
+def blobs(sizes, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = np.eye(len(sizes), 4) * 50
+    X = np.vstack([center + rng.normal(size=(size, 4)) for center, size in zip(centers, sizes)])
+    truth = np.repeat(np.arange(len(sizes)), sizes)
+    return X, truth
+
+
+def test_kmeans_recovers_separated_blobs_largest_first():
+    X, truth = blobs([300, 200, 100])
+    labels, centroids, _ = clusters.kmeans(X, 3, restarts=3)
+
+    # suurin ryhmä ensin
+    assert np.bincount(labels).tolist() == [300, 200, 100]
+    assert (labels == truth).all()
+    assert centroids.shape == (3, 4)
+
+
+def test_empty_cluster_is_reseeded():
+    X, _ = blobs([50, 50])
+    Z_sq = np.einsum("ij,ij->i", X, X)
+    start = np.array([X[0], X[0] + 1e-3, np.full(4, 1e6)])
+    labels, centroids, _ = clusters._lloyd(X, Z_sq, start, 100)
+
+    counts = np.bincount(labels, minlength=3)
+    assert counts.min() >= 1
+    assert counts.sum() == len(X)
+    for j in range(3):
+        assert np.allclose(centroids[j], X[labels == j].mean(axis=0))
+
+
+def test_synthetic_panel_clusters_and_stores(data_db):
+    X = clusters.synthetic_panel(2000, archetypes=4)
+    assert X.shape == (2000, len(clusters.FEATURES))
+    result = clusters.cluster(X, k=4, restarts=2)
+    assert result["sizes"].sum() == 2000
+    assert result["centroids"].shape == (4, len(clusters.FEATURES))
+
+    conn = sqlite3.connect(data_db)
+    emails = [f"u{i}@example.com" for i in range(2000)]
+    with conn:
+        clusters.write_results(conn, emails, result, "2026-01-01T00:00:00")
+    stored = conn.execute("SELECT COUNT(*) FROM scenario_clusters").fetchone()[0]
+    centroid_rows = conn.execute("SELECT COUNT(*) FROM cluster_centroids").fetchone()[0]
+    conn.close()
+    assert stored == 2000
+    assert centroid_rows == 4 * len(clusters.FEATURES)
@@ -0,0 +1,40 @@
+import json
+import sqlite3
+
+import cohorts
+
+
+def add(conn, email, org, wildlands):
+    conn.execute(
+        "INSERT INTO responses (email, submit_count, organization_type, wildlands, protWoodlands, "
+        "unprotectedForest, farmland, developed, waterAndWetlands) VALUES (?, 1, ?, ?, 0, 0, 0, 0, 0)",
+        (email, json.dumps([org]), wildlands),
+    )
+
+
+def test_small_groups_are_left_out(data_db):
+    conn = sqlite3.connect(data_db)
+    for i in range(cohorts.MIN_GROUP_SIZE + 1):
+        add(conn, f"ngo{i}@example.com", "ngo", 100)
+    for i in range(cohorts.MIN_GROUP_SIZE):
+        add(conn, f"gov{i}@example.com", "gov", 0)
+    conn.commit()
+    summary = cohorts.compute_summary(conn)
+    conn.close()
+
+    assert summary["by_org"]["ngo"]["n"] == cohorts.MIN_GROUP_SIZE + 1
+    assert summary["by_org"]["ngo"]["p50"][0] == 100
+    # katsoja voi olla yksi viidestä -> ei näytetä
+    assert "gov" not in summary["by_org"]
+    assert summary["overall"]["n"] == 2 * cohorts.MIN_GROUP_SIZE + 1
+
+
+def test_no_band_before_enough_responses(data_db):
+    conn = sqlite3.connect(data_db)
+    for i in range(cohorts.MIN_GROUP_SIZE):
+        add(conn, f"u{i}@example.com", "ngo", 10)
+    conn.commit()
+    summary = cohorts.compute_summary(conn)
+    conn.close()
+
+    assert summary == {"overall": None, "by_org": {}}
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+import consensus
+import flow_model
+
+
+def scenarios(n):
+    row = [flow_model.DEFAULTS[name] for name in flow_model.INPUTS]
+    X = np.tile(np.array(row, dtype=np.float64), (n, 1))
+    X[:, flow_model.INPUT_INDEX["import_lumber"]] = np.arange(n) * 1000
+    return X
+
+
+def test_no_consensus_below_minimum():
+    assert consensus.flow_quantiles(scenarios(0)) is None
+    assert consensus.flow_quantiles(scenarios(consensus.MIN_RESPONDENTS - 1)) is None
+
+
+def test_quantiles_of_each_flow():
+    summary = consensus.flow_quantiles(scenarios(5))
+    assert summary["n"] == 5
+    assert summary["median"]["import_lumber"] == pytest.approx(2000)
+    assert summary["q1"]["import_lumber"] == pytest.approx(1000)
+    assert summary["q3"]["import_lumber"] == pytest.approx(3000)
+    assert summary["median"]["lumber"] == pytest.approx(flow_model.DEFAULTS["lumber"])
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+import feasible_region
+import flow_model
+
+
+@pytest.fixture(scope="module")
+def table():
+    return feasible_region.build_table()
+
+
+def test_nearest_balanced_setting_balances(table, baseline):
+    current = dict(baseline, import_lumber=0, lumbershare=20, papershare=60)
+    setting = feasible_region.nearest_balanced_setting(current, table)
+    assert setting is not None
+    assert setting["lumbershare"] + setting["papershare"] + current["fuelshare"] == pytest.approx(100)
+
+    flows = flow_model.compute_flows_for({**current, **setting})
+    # taulukko on float32
+    assert abs(flows["total_enduse"] - flows["lumber_supply"]) <= flow_model.BALANCE_TOLERANCE + 1
+
+
+def test_no_setting_without_forest(table, baseline):
+    current = dict(baseline, protWoodlands=0, unprotectedForest=0,
+                   **{name: 10_000_000 for name in flow_model.END_USES})
+    assert feasible_region.nearest_balanced_setting(current, table) is None
+
+
+def test_fractional_forest_share_is_interpolated(table, baseline):
+    # Keinotekoinen taulukko: 100 000 nettotarjontaa metsäprosenttia kohden
+    shape = table["net_lumber"].shape[:2]
+    steep = dict(table, forest_share=np.array([0.0, 1.0, 2.0]),
+                 net_lumber=np.stack([np.full(shape, 1e5 * k, dtype=np.float32) for k in range(3)], axis=2))
+    current = dict(baseline, protWoodlands=0.5, unprotectedForest=0)
+    setting = feasible_region.nearest_balanced_setting(current, steep)
+
+    demand = sum(current[name] for name in flow_model.END_USES)
+    supplied = 0.5e5 + setting["import_lumber"] + setting["recovery_timber"]
+    assert abs(demand - supplied) <= flow_model.BALANCE_TOLERANCE
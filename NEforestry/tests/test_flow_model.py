@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+import flow_model
+
+
+def scalar_flows(data):
+    """The formulas update_all_charts used before the kernel, one scenario at a time."""
+    total_logging = data["logging_intensity"] * ((data["unprotectedForest"] + data["protWoodlands"]) / 100 * 40000)
+    lumber = data["lumbershare"] / 100 * total_logging
+    from_lumber_to_pulp = 0.333 * lumber
+    return {
+        "total_logging": total_logging,
+        "timber_supply": total_logging + data["import_lumber"] + data["import_paper"],
+        "lumber_supply": lumber + data["import_lumber"] - from_lumber_to_pulp + data["recovery_timber"],
+        "pulp_supply": data["papershare"] / 100 * total_logging + data["import_paper"] + from_lumber_to_pulp,
+        "fuel_supply": data["fuelshare"] / 100 * total_logging,
+        "total_enduse": sum(data[name] for name in flow_model.END_USES),
+    }
+
+
+def random_scenarios(n, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for _ in range(n):
+        row = {name: float(rng.uniform(0, 100)) for name in flow_model.INPUTS}
+        for name in ("import_lumber", "import_paper", "recovery_timber") + flow_model.END_USES:
+            row[name] = float(rng.uniform(0, 100000))
+        rows.append(row)
+    return rows
+
+
+def test_compute_flows_matches_scalar_formulas():
+    rows = random_scenarios(50)
+    flows = flow_model.compute_flows(flow_model.scenario_matrix(rows))
+    for i, row in enumerate(rows):
+        for name, expected in scalar_flows(row).items():
+            assert flows[name][i] == pytest.approx(expected)
+
+
+def test_compute_flows_for_baseline(baseline):
+    flows = flow_model.compute_flows_for(baseline)
+    assert flows["lumber"] == pytest.approx(336960)
+    assert flows["from_lumber_to_pulp"] == pytest.approx(112207.68)
+    assert flows["total_shares"] == pytest.approx(100)
+
+
+def test_scenario_matrix_treats_missing_as_zero():
+    X = flow_model.scenario_matrix([{"logging_intensity": 20, "protWoodlands": None}])
+    assert X.shape == (1, len(flow_model.INPUTS))
+    assert X[0, flow_model.INPUT_INDEX["logging_intensity"]] == 20
+    assert X.sum() == 20
@@ -0,0 +1,23 @@
+import sqlite3
+
+import init_user_db
+
+
+def test_import_users_skips_existing(tmp_path):
+    csv_path = tmp_path / "invited.csv"
+    csv_path.write_text("email,password\na@example.com,one\nb@example.com,two\na@example.com,three\nc@example.com,\n")
+    users_db = str(tmp_path / "users.db")
+    data_db = str(tmp_path / "data.db")
+    # users-taulua ei luoda etukäteen: import_users luo sen itse
+
+    assert init_user_db.import_users(str(csv_path), users_db, data_db) == (4, 2, 1)
+
+    conn = sqlite3.connect(users_db)
+    stored = dict(conn.execute("SELECT email, password_hash FROM users"))
+    conn.close()
+    assert stored["a@example.com"] == init_user_db.hash_password("one")
+    assert "c@example.com" not in stored
+
+    conn = sqlite3.connect(data_db)
+    assert conn.execute("SELECT COUNT(*) FROM responses").fetchone() == (2,)
+    conn.close()
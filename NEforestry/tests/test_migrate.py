@@ -0,0 +1,72 @@
+import sqlite3
+
+import aggregates
+import migrate
+import schema
+
+
+def versions(path):
+    conn = sqlite3.connect(path)
+    try:
+        return [row[0] for row in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+    finally:
+        conn.close()
+
+
+def test_migrate_is_idempotent(tmp_path):
+    # migrate() avaa kannan polulla, joten :memory: ei säily kutsujen välillä
+    path = str(tmp_path / "data.db")
+    latest = migrate.MIGRATIONS[-1][0]
+
+    assert migrate.migrate(path) == latest
+    assert migrate.migrate(path) == latest
+    assert versions(path) == [number for number, _, _ in migrate.MIGRATIONS]
+
+
+def test_migrate_upgrades_old_database(tmp_path):
+    path = str(tmp_path / "data.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE responses (id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT UNIQUE, logins INTEGER)")
+    conn.execute("INSERT INTO responses (email, logins) VALUES ('a@example.com', 2)")
+    conn.commit()
+    conn.close()
+
+    migrate.migrate(path)
+
+    conn = sqlite3.connect(path)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(responses)")}
+    logins = conn.execute("SELECT logins FROM responses").fetchone()
+    backfill = conn.execute("SELECT amount FROM events WHERE email = 'a@example.com' AND event = 'logins'").fetchone()
+    conn.close()
+    assert set(schema.COLUMN_NAMES) <= columns
+    assert logins == (2,)
+    # vanhat laskurit alkusaldoksi events-tauluun
+    assert backfill == (2,)
+
+
+def test_aggregates_step_matches_rebuild(tmp_path):
+    path = str(tmp_path / "data.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE responses (id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT UNIQUE, submit_count INTEGER, "
+        "wildlands REAL, logging_intensity REAL, other_val REAL, biodiversity INTEGER, biodiversity_cannot_answer INTEGER)"
+    )
+    conn.executemany("INSERT INTO responses (email, submit_count, wildlands, logging_intensity, other_val, "
+                     "biodiversity, biodiversity_cannot_answer) VALUES (?, ?, ?, ?, ?, ?, ?)", [
+                         ("a@example.com", 1, 10, 27.3, 34400, 4, 0),
+                         ("b@example.com", 2, 12.5, 30, 35600, 2, 1),
+                         ("c@example.com", 0, 99, 10, 1000, 5, 0),
+                     ])
+    conn.commit()
+    conn.close()
+
+    migrate.migrate(path)
+
+    conn = sqlite3.connect(path)
+    migrated = aggregates.summary(conn)
+    aggregates.rebuild(conn)
+    rebuilt = aggregates.summary(conn)
+    conn.close()
+    assert migrated == rebuilt
+    assert migrated["wildlands"]["n"] == 2
+    assert migrated["biodiversity"]["n"] == 1
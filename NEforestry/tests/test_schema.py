@@ -0,0 +1,41 @@
+import json
+import sqlite3
+
+import schema
+
+
+def responses_conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(schema.CREATE_TABLE_SQL)
+    return conn
+
+
+def fetch(conn, email):
+    cursor = conn.execute("SELECT * FROM responses WHERE email = ?", (email,))
+    row = cursor.fetchone()
+    return dict(zip([d[0] for d in cursor.description], row))
+
+
+def test_default_row_is_inserted_once():
+    conn = responses_conn()
+    conn.execute(schema.INSERT_DEFAULT_ROW_SQL, schema.default_row("a@example.com"))
+    conn.execute(schema.INSERT_DEFAULT_ROW_SQL, schema.default_row("a@example.com"))
+    assert conn.execute("SELECT COUNT(*) FROM responses").fetchone() == (1,)
+
+    values = schema.form_values(fetch(conn, "a@example.com"))
+    assert set(values) == {column.name for column in schema.FORM_COLUMNS}
+    assert all(values[name] == [] for name in schema.JSON_COLUMNS)
+
+
+def test_upsert_overwrites_form_columns():
+    conn = responses_conn()
+    conn.execute(schema.INSERT_DEFAULT_ROW_SQL, schema.default_row("a@example.com"))
+    row = dict(schema.form_values(None), email="a@example.com", wildlands=7, organization_type=["ngo"])
+    for name in schema.JSON_COLUMNS:
+        row[name] = json.dumps(row[name])
+    conn.execute(schema.UPSERT_SQL, [row[name] for name in schema.SUBMIT_COLUMNS])
+
+    stored = fetch(conn, "a@example.com")
+    assert stored["wildlands"] == 7
+    assert json.loads(stored["organization_type"]) == ["ngo"]
+    assert conn.execute("SELECT COUNT(*) FROM responses").fetchone() == (1,)
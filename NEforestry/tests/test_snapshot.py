@@ -0,0 +1,60 @@
+import json
+import sqlite3
+
+import schema
+import snapshot
+import telemetry
+
+
+def test_responses_frame_types_and_one_hot(data_db):
+    conn = sqlite3.connect(data_db)
+    conn.execute(schema.INSERT_DEFAULT_ROW_SQL, schema.default_row("a@example.com"))
+    conn.execute(
+        "UPDATE responses SET organization_type = ?, years_experience = 12, wildlands = 2.5",
+        (json.dumps(["ngo", "gov"]),),
+    )
+    conn.commit()
+
+    copy = snapshot.backup(data_db)
+    df = snapshot.responses_frame(copy)
+    copy.close()
+    conn.close()
+
+    assert df.loc[0, "organization_type"] == ["ngo", "gov"]
+    assert bool(df.loc[0, "organization_type__ngo"]) and bool(df.loc[0, "organization_type__gov"])
+    assert str(df["wildlands"].dtype) == "float64"
+    assert str(df["logins"].dtype) == "Int64"
+    assert df.loc[0, "years_experience"] == 12
+
+
+def test_fractional_integer_values_do_not_break_snapshot(data_db):
+    conn = sqlite3.connect(data_db)
+    conn.execute(schema.INSERT_DEFAULT_ROW_SQL, schema.default_row("a@example.com"))
+    # vapaa numerokenttä: SQLite tallentaa 2.5:n REAL-arvona INTEGER-sarakkeeseen
+    conn.execute("UPDATE responses SET years_experience = 2.5")
+    conn.execute(telemetry.INSERT_EVENTS_SQL, telemetry.event("a@example.com", "logins", 3.0))
+    conn.commit()
+    conn.close()
+
+    copy = snapshot.backup(data_db)
+    df = snapshot.responses_frame(copy)
+    copy.close()
+
+    assert df.loc[0, "years_experience"] == 2.5
+    assert df.loc[0, "logins"] == 3
+    assert str(df["logins"].dtype) == "Int64"
+
+
+def test_counters_come_from_the_event_log(data_db):
+    conn = sqlite3.connect(data_db)
+    conn.execute(schema.INSERT_DEFAULT_ROW_SQL, schema.default_row("a@example.com"))
+    # tapahtumat kirjoitettu, laskureita ei vielä päivitetty responses-tauluun
+    conn.executemany(telemetry.INSERT_EVENTS_SQL, [telemetry.event("a@example.com", "logins")] * 2)
+    conn.commit()
+    conn.close()
+
+    copy = snapshot.backup(data_db)
+    df = snapshot.responses_frame(copy)
+    copy.close()
+
+    assert df.loc[0, "logins"] == 2
@@ -0,0 +1,64 @@
+import sqlite3
+
+import pytest
+
+import schema
+import telemetry
+
+
+def test_events_are_buffered_merged_and_materialized(data_db):
+    conn = sqlite3.connect(data_db)
+    conn.execute(schema.INSERT_DEFAULT_ROW_SQL, schema.default_row("a@example.com"))
+    conn.commit()
+
+    counters = telemetry.CounterBuffer(data_db, flush_seconds=3600)
+    counters.add("a@example.com", "logins")
+    counters.add("a@example.com", "logins")
+    counters.add("a@example.com", "elapsed_time_seconds", 30)
+    counters.add("a@example.com", "elapsed_time_seconds", 30)
+    # aktiivisuusaika yhdistyy yhdeksi riviksi
+    assert counters.flush() == 3
+
+    counters.add("a@example.com", "reset_btn_1")
+    counters.materialize("a@example.com")
+
+    row = conn.execute(
+        "SELECT logins, elapsed_time_seconds, reset_btn_1, reset_btn_2 FROM responses WHERE email = 'a@example.com'"
+    ).fetchone()
+    conn.close()
+    assert row == (2, 60, 1, 0)
+
+
+def test_unknown_counter_is_rejected(data_db):
+    with pytest.raises(ValueError):
+        telemetry.CounterBuffer(data_db).add("a@example.com", "no_such_counter")
+
+
+def test_writes_are_reported_per_email(data_db):
+    written = []
+    counters = telemetry.CounterBuffer(data_db, flush_seconds=3600, on_write=written.append)
+    counters.add("a@example.com", "logins")
+    counters.add("b@example.com", "logins")
+    counters.flush()
+    counters.materialize("a@example.com")
+
+    assert written == [{"a@example.com", "b@example.com"}, ["a@example.com"]]
+
+
+def test_responses_query_sums_unmaterialized_events(data_db):
+    conn = sqlite3.connect(data_db)
+    conn.execute(schema.INSERT_DEFAULT_ROW_SQL, schema.default_row("a@example.com"))
+    conn.commit()
+
+    counters = telemetry.CounterBuffer(data_db, flush_seconds=3600)
+    counters.add("a@example.com", "logins")
+    counters.add("a@example.com", "reset_btn_2")
+    counters.flush()
+
+    stored = [d[0] for d in conn.execute("SELECT * FROM responses").description]
+    cursor = conn.execute(telemetry.responses_query(conn))
+    names = [d[0] for d in cursor.description]
+    row = dict(zip(names, cursor.fetchone()))
+    conn.close()
+    assert names == stored
+    assert (row["email"], row["logins"], row["reset_btn_2"], row["reset_btn_1"]) == ("a@example.com", 1, 1, 0)